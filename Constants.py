@@ -1,15 +1,25 @@
 import pygame
 
 pygame.init()
-info = pygame.display.Info()
-SCREEN_WIDTH = info.current_w
-SCREEN_HEIGHT = info.current_h - 60 
+if pygame.display.get_init():
+    info = pygame.display.Info()
+    SCREEN_WIDTH = info.current_w
+    SCREEN_HEIGHT = info.current_h - 60 
+else:
+    # no video driver available (headless training box)
+    SCREEN_WIDTH = 1280
+    SCREEN_HEIGHT = 720
 
 DISPLAY_WIDTH = 320
 DISPLAY_HEIGHT = 240
 FPS = 60
+# fixed physics steps per second, the physics constants are per step; wall
+# time caught up in one frame is capped so a long hitch doesn't snowball
+SIM_RATE = 60
+MAX_FRAME_TIME = 0.25
 
 BASE_IMG_PATH = r'data/images/'
+ASSET_PACK_PATH = r'data/assets.pack'
 RECT = r'data\images\Rect.png'
 FONT = r'data\font\Menu.ttf'
 FONT2 = r'data\font\Default.otf'
@@ -51,10 +61,44 @@ CAMERA_SPEED = 10
 PARTICLE_COUNT_DASH = 8
 PARTICLE_SPEED_MIN = 0.5
 PARTICLE_SPEED_MAX = 1.0
+PARTICLE_POOL_SIZE = 256
 
 # Clouds
 CLOUD_COUNT = 10
 
+# Headless environment rewards
+REWARD_FINISH = 1.0
+REWARD_DEATH = -1.0
+# Optional shaping, off by default: per tile of path distance gained, per frame, per dash
+REWARD_PROGRESS = 0.0
+REWARD_TIME = 0.0
+REWARD_DASH = 0.0
+
+# Numeric observations: side of the tile window around the player, odd
+OBSERVATION_WINDOW = 9
+# Pixel observations: downscaled frame size and how many frames are stacked
+PIXEL_OBSERVATION_SIZE = (84, 84)
+PIXEL_OBSERVATION_STACK = 4
+
+# Procedural levels
+LEVEL_PLATFORMS = 12
+LEVEL_CHECKPOINT_EVERY = 4
+# reachability search: frames each macro action is held, states kept per level
+# and depth, depth before giving up, levels searched together in one grid
+REACHABILITY_FRAMES = 12
+REACHABILITY_BEAM = 16
+REACHABILITY_MAX_DEPTH = 400
+REACHABILITY_BATCH = 32
+
+# Curriculum: episodes per success rate, rate that unlocks the next difficulty
+CURRICULUM_WINDOW = 50
+CURRICULUM_PROMOTE = 0.7
+
+# Editor: undo steps kept, journal records appended before the autosave
+# log is folded into a fresh snapshot
+JOURNAL_LIMIT = 256
+AUTOSAVE_COMPACT_EVERY = 200
+
 # Colors
 MENUTXTCOLOR = (186,248,186)
 WHITE = (255, 255, 255)
@@ -76,7 +120,10 @@ KEY_SAVE = pygame.K_o
 KEY_SHIFT = pygame.K_LSHIFT
 
 DEFAULT_MAP_PATH = 'map.json'
+REPLAY_PATH = 'last_run.replay'
+AUTOSAVE_PATH = 'autosave'  # .pmap snapshot plus .log of edits since
 TILE_SIZE = 16
+CHUNK_SIZE = 16  # tiles per side of a pre-rendered tilemap chunk
 AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, 1)])): 0,
     tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
@@ -93,4 +140,10 @@ NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1)
 PHYSICS_TILES = {'grass', 'stone'}
 AUTOTILE_TYPES = {'grass', 'stone', 'spikes'}
 
+# Compiled tile grid: id 0 is an empty cell, type ids are index + 1
+TILE_TYPES = ['grass', 'stone', 'spikes', 'decor', 'large_decor', 'spawners', 'checkpoint', 'finish']
+TILE_FLAG_SOLID = 1
+TILE_FLAG_SPIKE = 2
+TILE_FLAG_FINISH = 4
+
 
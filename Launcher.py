@@ -1,34 +1,88 @@
+import argparse
+import time
+
 import pygame
-from Constants import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, FONT
+from Constants import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, FONT, SIM_RATE, MAX_FRAME_TIME
 from game import Game
 from Menu import Menu
 from screenstate import state_control
+from scripts.assets import assets
 from scripts.utils import Text
 class Engine:
-    def __init__(self):
+    """One loop for every state: events, fixed physics steps, one render.
+
+    The simulation advances in steps of 1 / SIM_RATE seconds of wall time,
+    however long frames take, and the frame is drawn between the last two
+    steps. With uncapped=True a simulated state instead steps as fast as it
+    can and is drawn FPS times a second.
+    """
+    def __init__(self, uncapped=False):
         pygame.init()
         pygame.display.set_caption('Celeste Temu')
-        
+
         self.display = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        
+
         self.clock = pygame.time.Clock()
-        self.game = Game(self.display)
+        self.uncapped = uncapped
+        self.game = Game(self.display, self.clock)
         self.menu = Menu(self.display)
 
         self.state = {'game': self.game, 'menu': self.menu}
+        for name, state in self.state.items():
+            state_control.addState(name, state)
+
+        self.hud_font = assets.sys_font(FONT, 50)
+        self.fps = None
+        self.fps_text = None
+
+    def draw_hud(self):
+        # re-rendered only when the number changes
+        fps = int(self.clock.get_fps())
+        if fps != self.fps:
+            self.fps = fps
+            self.fps_text = self.hud_font.render(str(fps), True, pygame.Color("RED"))
+        self.display.blit(self.fps_text, (0, 0))
 
     def run(self):
+        step = 1 / SIM_RATE
+        accumulator = 0.0
+        previous = time.perf_counter()
         while True:
-            self.state[state_control.getState()].run()
+            state = state_control.activeState()
+            for event in pygame.event.get():
+                state.handle_event(event)
 
-            font = pygame.font.SysFont(FONT, 50) 
-            fps = str(int(self.clock.get_fps()))
-            fps_t = font.render(fps, True, pygame.Color("RED"))
+            now = time.perf_counter()
+            uncapped = self.uncapped and state.simulated
+            if uncapped:
+                # steps until a display frame's worth of time has passed
+                deadline = now + 1 / FPS
+                while time.perf_counter() < deadline:
+                    state.update()
+                alpha = 1.0
+                previous = time.perf_counter()
+                accumulator = 0.0
+            else:
+                accumulator += min(now - previous, MAX_FRAME_TIME)
+                previous = now
+                while accumulator >= step:
+                    state.update()
+                    accumulator -= step
+                alpha = accumulator / step
 
-            self.display.blit(fps_t, (0, 0))
-            pygame.display.update() 
-            self.clock.tick(FPS)
+            dirty = state.render(alpha)
+            if dirty is not None:
+                # the state tracks its own changes, push only those; the FPS
+                # counter is left to states that repaint every frame
+                pygame.display.update(dirty)
+            else:
+                self.draw_hud()
+                pygame.display.update()
+            self.clock.tick(0 if uncapped else FPS)
 
 
 if __name__ == '__main__':
-    Engine().run()
+    parser = argparse.ArgumentParser(description='Run the game.')
+    parser.add_argument('--uncapped', action='store_true',
+                        help='simulate as fast as possible instead of SIM_RATE steps per second')
+    Engine(parser.parse_args().uncapped).run()
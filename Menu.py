@@ -1,10 +1,11 @@
 import pygame, sys
 from scripts.utils import Button
 from screenstate import state_control
+from scripts.assets import assets
 from Constants import SCREEN_WIDTH, FONT, RECT, MENUBG, WHITE, MENUTXTCOLOR
 
 def font_scale(size, Font=FONT):
-    return pygame.font.Font(Font, size)
+    return assets.font(Font, size)
 
 def create_shadowed_text(text, font, color, shadow_color=(0,0,0), offset=4):
     shadow = font.render(text, True, shadow_color)
@@ -16,39 +17,70 @@ def create_shadowed_text(text, font, color, shadow_color=(0,0,0), offset=4):
     return combined
                   
 class Menu():
+    simulated = False
+
     def __init__(self, screen):
         self.screen = screen
-        self.background = pygame.image.load(MENUBG)
-    def run(self):
-        self.screen.blit(self.background, (0,0))
-        
-        MENU_MOUSE_POS = pygame.mouse.get_pos()
-        font = font_scale(85, FONT)
-        MENU_TEXT = create_shadowed_text("Temu Celeste", font, color=WHITE)
-        MENU_RECT = MENU_TEXT.get_rect(center=(SCREEN_WIDTH//2, 100))
+        self.background = assets.image_file(MENUBG)
+
+        # built once, afterwards only the buttons' hover state changes
+        self.title = create_shadowed_text("Temu Celeste", font_scale(85, FONT), color=WHITE)
+        self.title_rect = self.title.get_rect(center=(SCREEN_WIDTH//2, 100))
 
-        PLAY_BUTTON = Button(image=pygame.image.load(RECT), pos=(SCREEN_WIDTH//2, 250), 
+        self.play_button = Button(image=assets.image_file(RECT), pos=(SCREEN_WIDTH//2, 250), 
                             text_input="PLAY", font=font_scale(50), base_color=MENUTXTCOLOR, hovering_color="White")
-        OPTIONS_BUTTON = Button(image=pygame.image.load(RECT), pos=(SCREEN_WIDTH//2, 400), 
+        self.options_button = Button(image=assets.image_file(RECT), pos=(SCREEN_WIDTH//2, 400), 
                             text_input="Train AI", font=font_scale(42), base_color=MENUTXTCOLOR, hovering_color="White")
-        QUIT_BUTTON = Button(image=pygame.image.load(RECT), pos=(SCREEN_WIDTH//2, 550), 
+        self.quit_button = Button(image=assets.image_file(RECT), pos=(SCREEN_WIDTH//2, 550), 
                             text_input="QUIT", font=font_scale(50), base_color=MENUTXTCOLOR, hovering_color="White")
+        self.buttons = [self.play_button, self.options_button, self.quit_button]
 
-        self.screen.blit(MENU_TEXT, MENU_RECT)
+        # the whole screen is drawn on the first frame shown, after that
+        # only what hovering changes
+        self.redraw = True
+        self.dirty = []
 
-        for button in [PLAY_BUTTON, OPTIONS_BUTTON, QUIT_BUTTON]:
-            button.changeColor(MENU_MOUSE_POS)
+    def draw(self):
+        self.screen.blit(self.background, (0,0))
+        self.screen.blit(self.title, self.title_rect)
+        mouse_pos = pygame.mouse.get_pos()
+        for button in self.buttons:
+            button.changeColor(mouse_pos)
             button.update(self.screen)
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+
+    def draw_button(self, button):
+        # background under the button first, the hovered text may be wider
+        area = button.rect.union(button.text_rect)
+        self.screen.blit(self.background, area, area)
+        button.update(self.screen)
+        return area
+
+    def enter(self):
+        self.redraw = True
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.MOUSEMOTION:
+            for button in self.buttons:
+                if button.changeColor(event.pos):
+                    self.dirty.append(self.draw_button(button))
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.play_button.checkForInput(event.pos):
+                state_control.setState('game')
+            if self.quit_button.checkForInput(event.pos):
                 pygame.quit()
                 sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if PLAY_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    state_control.setState('game')
-                if QUIT_BUTTON.checkForInput(MENU_MOUSE_POS):
-                    pygame.quit()
-                    sys.exit()
-
-        pygame.display.update()
\ No newline at end of file
+
+    def update(self):
+        pass
+
+    def render(self, alpha=1.0):
+        # the rects that changed, nothing at all while the mouse is still
+        if self.redraw:
+            self.draw()
+            self.redraw = False
+            self.dirty = [self.screen.get_rect()]
+        dirty, self.dirty = self.dirty, []
+        return dirty
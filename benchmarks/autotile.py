@@ -0,0 +1,52 @@
+"""Cost of the editor's per-stroke autotile against a full pass, plus the
+variant check that keeps single-image types (spikes) renderable. Run from
+the repo root:
+
+    python -m benchmarks.autotile
+"""
+import random
+import time
+
+from Constants import DEFAULT_MAP_PATH
+from scripts.assets import assets
+from scripts.tilemap import Tilemap
+
+EDITS = 2000
+
+
+class Editor:
+    # just what Tilemap reads from its game
+    assets = assets
+
+
+def run(edits=EDITS):
+    tilemap = Tilemap(Editor())
+    tilemap.load(DEFAULT_MAP_PATH)
+    cells = list(map(tuple, (tile['pos'] for tile in tilemap.tilemap.values())))
+    rng = random.Random(0)
+
+    worst = 0.0
+    start = time.perf_counter()
+    for _ in range(edits):
+        x, y = rng.choice(cells)
+        tilemap.set_tile((x + rng.randint(-2, 2), y + rng.randint(-2, 2)), rng.choice(('grass', 'stone', 'spikes')), 0)
+        edit_start = time.perf_counter()
+        tilemap.autotile_dirty()
+        worst = max(worst, time.perf_counter() - edit_start)
+    incremental = (time.perf_counter() - start) / edits
+
+    start = time.perf_counter()
+    tilemap.autotile()
+    full = time.perf_counter() - start
+
+    # every variant written must have an image to draw
+    limits = tilemap.autotile_limits()
+    for tile in tilemap.tilemap.values():
+        limit = limits[tilemap.type_ids[tile['type']]]
+        assert not limit or tile['variant'] < limit, tile
+    return incremental, worst, full
+
+
+if __name__ == '__main__':
+    incremental, worst, full = run()
+    print(f'per edit {incremental * 1e3:.3f} ms (worst {worst * 1e3:.3f} ms), full pass {full * 1e3:.3f} ms')
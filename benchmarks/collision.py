@@ -0,0 +1,73 @@
+"""Steps/sec of the swept collision in Player.update against the old
+per-frame physics_rects_around rebuild. Run from the repo root:
+
+    python -m benchmarks.collision
+"""
+import random
+import time
+
+from Constants import PLAYER_SIZE
+from environment import Environment
+from player import Player
+
+STEPS = 50000
+
+
+class RectPlayer(Player):
+    # the collision pass Player.update used before Tilemap.sweep
+    def _move_and_collide(self, tilemap, frame_movement):
+        self.pos[0] += frame_movement[0]
+        entity_rect = self.rect()
+        for rect in tilemap.physics_rects_around(self.pos):
+            if entity_rect.colliderect(rect):
+                if frame_movement[0] > 0:
+                    entity_rect.right = rect.left
+                    self.collisions['right'] = True
+                if frame_movement[0] < 0:
+                    entity_rect.left = rect.right
+                    self.collisions['left'] = True
+                self.pos[0] = entity_rect.x
+
+        self.pos[1] += frame_movement[1]
+        entity_rect = self.rect()
+        for rect in tilemap.physics_rects_around(self.pos):
+            if entity_rect.colliderect(rect):
+                if frame_movement[1] > 0:
+                    entity_rect.bottom = rect.top
+                    self.collisions['down'] = True
+                if frame_movement[1] < 0:
+                    entity_rect.top = rect.bottom
+                    self.collisions['up'] = True
+                self.pos[1] = entity_rect.y
+
+
+def run(player_class, steps=STEPS):
+    env = Environment()
+    env.player = player_class(None, env.default_pos, PLAYER_SIZE, environment=env)
+    env.reset()
+    rng = random.Random(0)
+    inputs = [(rng.randint(0, 8), rng.choice((0, 0, 0, 1, 2))) for _ in range(steps)]
+
+    start = time.perf_counter()
+    for action, state in inputs:
+        obs, reward, done, info = env.step(action, state)
+        if done:
+            env.reset()
+    step_time = time.perf_counter() - start
+
+    # collision pass alone, from a standing start on the spawn platform
+    player = env.player
+    player.pos = env.default_pos.copy()
+    start = time.perf_counter()
+    for i in range(steps):
+        player._move_and_collide(env.tilemap, [1.5 if i % 40 < 20 else -1.5, 0.1])
+    collide_time = time.perf_counter() - start
+
+    return steps / step_time, steps / collide_time
+
+
+if __name__ == '__main__':
+    print(f"{'collision':<12}{'env steps/s':>14}{'collide/s':>14}")
+    for name, player_class in (('rects', RectPlayer), ('swept', Player)):
+        step_rate, collide_rate = run(player_class)
+        print(f'{name:<12}{step_rate:>14.0f}{collide_rate:>14.0f}')
@@ -1,11 +1,16 @@
+import math
+import os
 import sys
 
 import pygame
 
-from scripts.utils import load_images, load_image
+from scripts.utils import load_image
+from scripts.assets import assets
 from scripts.tilemap import Tilemap
-from Constants import DISPLAY_HEIGHT, DISPLAY_WIDTH, SCREEN_WIDTH, SCREEN_HEIGHT
+from scripts.journal import EditJournal, Autosave
+from Constants import ASSET_PACK_PATH, AUTOSAVE_PATH, AUTOTILE_TYPES, DISPLAY_HEIGHT, DISPLAY_WIDTH, SCREEN_WIDTH, SCREEN_HEIGHT
 RENDER_SCALE = 2.0
+EDITOR_TILES = ['decor', 'grass', 'large_decor', 'stone', 'spawners', 'spikes', 'checkpoint']
 
 class Editor:
     def __init__(self):
@@ -17,28 +22,29 @@ class Editor:
 
         self.clock = pygame.time.Clock()
         self.bgIMG = load_image('background.png', scale=(DISPLAY_WIDTH, DISPLAY_HEIGHT))
-        self.assets = {
-            'decor': load_images('tiles/decor'),
-            'grass': load_images('tiles/grass'),
-            'large_decor': load_images('tiles/large_decor'),
-            'stone': load_images('tiles/stone'),
-            'spawners': load_images('tiles/spawners'),
-            'spikes': load_images('tiles/spikes'),
-            'checkpoint': load_images('tiles/Checkpoint'),
-        }
+        if os.path.exists(ASSET_PACK_PATH):
+            assets.load_pack(ASSET_PACK_PATH)
+        self.assets = assets
         
         self.movement = [False, False, False, False]
         
         self.tilemap = Tilemap(self, tile_size=16)
         
-        try:
-            self.tilemap.load('map.json')
-        except FileNotFoundError:
-            pass
+        # edits a crash left unsaved come back, unless map.json is newer
+        self.autosave = Autosave(self.tilemap, AUTOSAVE_PATH)
+        if self.autosave.recover('map.json'):
+            self.autosave.compact()
+        else:
+            self.autosave.remove()
+            try:
+                self.tilemap.load('map.json')
+            except FileNotFoundError:
+                pass
+        self.journal = EditJournal(self.tilemap, self.autosave)
         
         self.scroll = [0, 0]
         
-        self.tile_list = list(self.assets)
+        self.tile_list = EDITOR_TILES
         self.tile_group = 0
         self.tile_variant = 0
         
@@ -46,62 +52,131 @@ class Editor:
         self.right_clicking = False
         self.shift = False
         self.ongrid = True
-        
+
+        self.overlay = self.grid_overlay()
+        self.previews = {}
+        self.scene = pygame.Surface((DISPLAY_WIDTH, DISPLAY_HEIGHT))
+        self.scene_scroll = None
+        self.redraw = True
+        self.last_preview = pygame.Rect(0, 0, 0, 0)
+
+    def present(self, rect):
+        # one display rect scaled into the matching window rect. The rect is
+        # widened to whole periods of the scale ratio (5 display pixels to 16
+        # window pixels for 320 -> 1024) so it samples exactly the pixels a
+        # full-window scale would; returns the window rect
+        width, height = self.screen.get_size()
+        period_x = DISPLAY_WIDTH // math.gcd(DISPLAY_WIDTH, width)
+        period_y = DISPLAY_HEIGHT // math.gcd(DISPLAY_HEIGHT, height)
+        left = rect.left // period_x * period_x
+        top = rect.top // period_y * period_y
+        right = -(-(rect.right + 1) // period_x) * period_x
+        bottom = -(-(rect.bottom + 1) // period_y) * period_y
+        rect = pygame.Rect(left, top, right - left, bottom - top).clip(self.display.get_rect())
+        if not rect.w or not rect.h:
+            return None
+        dest = pygame.Rect(rect.left * width // DISPLAY_WIDTH, rect.top * height // DISPLAY_HEIGHT,
+                           rect.w * width // DISPLAY_WIDTH, rect.h * height // DISPLAY_HEIGHT)
+        pygame.transform.scale(self.display.subsurface(rect), dest.size, self.screen.subsurface(dest))
+        return dest
+
+    def grid_overlay(self):
+        # one tile larger than the display so it can be shifted by the scroll remainder
+        ts = self.tilemap.tile_size
+        overlay = pygame.Surface((DISPLAY_WIDTH + ts, DISPLAY_HEIGHT + ts))
+        overlay.fill((20, 20, 20))
+        for x in range(0, overlay.get_width(), ts):
+            pygame.draw.line(overlay, (50, 50, 50), (x, 0), (x, overlay.get_height()))
+        for y in range(0, overlay.get_height(), ts):
+            pygame.draw.line(overlay, (50, 50, 50), (0, y), (overlay.get_width(), y))
+        return overlay
+
+    def preview(self, tile_type, variant):
+        if (tile_type, variant) not in self.previews:
+            img = self.assets[tile_type][variant].copy()
+            img.set_alpha(100)
+            self.previews[(tile_type, variant)] = img
+        return self.previews[(tile_type, variant)]
+
     def run(self):
         while True:
-            self.display.fill((20, 20, 20))
-            # Draw grid
-            for x in range(0, DISPLAY_WIDTH, self.tilemap.tile_size):
-                pygame.draw.line(self.display, (50, 50, 50), (x - self.scroll[0] % self.tilemap.tile_size, 0), (x - self.scroll[0] % self.tilemap.tile_size, DISPLAY_HEIGHT))
-            for y in range(0, DISPLAY_HEIGHT, self.tilemap.tile_size):
-                pygame.draw.line(self.display, (50, 50, 50), (0, y - self.scroll[1] % self.tilemap.tile_size), (DISPLAY_WIDTH, y - self.scroll[1] % self.tilemap.tile_size))
-
             self.scroll[0] += (self.movement[1] - self.movement[0]) * 2
             self.scroll[1] += (self.movement[3] - self.movement[2]) * 2
             render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-            
-            self.tilemap.render(self.display, offset=render_scroll)
-            
-            current_tile_img = self.assets[self.tile_list[self.tile_group]][self.tile_variant].copy()
-            current_tile_img.set_alpha(100)
-            
+
+            # grid and tiles only change on scroll or edit, the rest of the
+            # time the cached scene is reused and only the preview moves
+            if self.redraw or render_scroll != self.scene_scroll:
+                ts = self.tilemap.tile_size
+                self.scene.blit(self.overlay, (-(render_scroll[0] % ts), -(render_scroll[1] % ts)))
+                self.tilemap.render(self.scene, offset=render_scroll)
+                self.scene_scroll = render_scroll
+                self.redraw = False
+                full_update = True
+            else:
+                full_update = False
+            self.display.blit(self.scene, (0, 0))
+
+            current_tile_img = self.preview(self.tile_list[self.tile_group], self.tile_variant)
+
             mpos = pygame.mouse.get_pos()
             scale_x = DISPLAY_WIDTH / SCREEN_WIDTH
             scale_y = DISPLAY_HEIGHT / SCREEN_HEIGHT
             mpos = (mpos[0] * scale_x, mpos[1] * scale_y)
             tile_pos = (int((mpos[0] + self.scroll[0]) // self.tilemap.tile_size), int((mpos[1] + self.scroll[1]) // self.tilemap.tile_size))
-            
+
             if self.ongrid:
-                self.display.blit(current_tile_img, (tile_pos[0] * self.tilemap.tile_size - self.scroll[0], tile_pos[1] * self.tilemap.tile_size - self.scroll[1]))
+                preview_pos = (tile_pos[0] * self.tilemap.tile_size - self.scroll[0], tile_pos[1] * self.tilemap.tile_size - self.scroll[1])
             else:
-                self.display.blit(current_tile_img, mpos)
-            
+                preview_pos = mpos
+            self.display.blit(current_tile_img, preview_pos)
+            preview_rect = current_tile_img.get_rect(topleft=preview_pos)
+
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': tile_pos}
+                # holding the button over the same cell would redo the write every frame
+                tile_type = self.tile_list[self.tile_group]
+                tile = self.tilemap.tile_at(*tile_pos)
+                if tile is None or tile['type'] != tile_type or (tile_type not in AUTOTILE_TYPES and tile['variant'] != self.tile_variant):
+                    self.journal.set_tile(tile_pos, tile_type, self.tile_variant)
+                    self.redraw = True
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy():
+                if self.journal.remove_tile(tile_pos) is not None:
+                    self.redraw = True
+                # only the offgrid buckets around the cursor
+                point = (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])
+                for tile in self.tilemap.offgrid_in((point[0], point[1], 1, 1)):
                     tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                    tile_r = pygame.Rect(tile['pos'][0], tile['pos'][1], tile_img.get_width(), tile_img.get_height())
+                    if tile_r.collidepoint(point):
+                        self.journal.remove_offgrid(tile)
+                        self.redraw = True
+            self.journal.autotile()
             
             self.display.blit(current_tile_img, (5, 5))
             
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    self.journal.end()
+                    self.autosave.close()
+                    # a clean exit, unsaved edits are dropped as before
+                    self.autosave.remove()
                     pygame.quit()
                     sys.exit()
                     
                 if event.type == pygame.MOUSEBUTTONDOWN:
+                    if event.button in (1, 3):
+                        # everything until the buttons are released is one undo step
+                        self.journal.begin()
                     if event.button == 1:
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
+                            self.journal.add_offgrid({'type': self.tile_list[self.tile_group], 'variant': self.tile_variant, 'pos': (mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])})
+                            self.redraw = True
                     if event.button == 3:
                         self.right_clicking = True
+                    if event.button in (4, 5):
+                        # the corner preview changes, push the whole window next frame
+                        self.redraw = True
                     if self.shift:
                         if event.button == 4:
                             self.tile_variant = (self.tile_variant - 1) % len(self.assets[self.tile_list[self.tile_group]])
@@ -119,6 +194,8 @@ class Editor:
                         self.clicking = False
                     if event.button == 3:
                         self.right_clicking = False
+                    if not self.clicking and not self.right_clicking:
+                        self.journal.end()
                         
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_a:
@@ -132,9 +209,18 @@ class Editor:
                     if event.key == pygame.K_g:
                         self.ongrid = not self.ongrid
                     if event.key == pygame.K_t:
-                        self.tilemap.autotile()
+                        self.journal.autotile(full=True)
+                        self.redraw = True
+                    if event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                        self.redraw |= self.journal.undo()
+                    if event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                        self.redraw |= self.journal.redo()
                     if event.key == pygame.K_o:
                         self.tilemap.save('map.json')
+                        # newer than map.json, so the edits after this save survive a crash
+                        self.autosave.compact()
+                    if event.key == pygame.K_p:
+                        self.tilemap.save('map.pmap')
                     if event.key == pygame.K_LSHIFT:
                         self.shift = True
                 if event.type == pygame.KEYUP:
@@ -149,8 +235,14 @@ class Editor:
                     if event.key == pygame.K_LSHIFT:
                         self.shift = False
             
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
+            if full_update:
+                pygame.transform.scale(self.display, self.screen.get_size(), self.screen)
+                pygame.display.update()
+            else:
+                # only the preview's old and new spots are scaled and pushed
+                dirty = [self.present(preview_rect), self.present(self.last_preview)]
+                pygame.display.update([rect for rect in dirty if rect is not None])
+            self.last_preview = preview_rect
             self.clock.tick(60)
 
 Editor().run()
\ No newline at end of file
@@ -1,56 +1,107 @@
-# Modified portion of environment.py
 import pygame
 from Constants import *
 from scripts.utils import load_image, load_images, Animation
-from scripts.tilemap import Tilemap
 from scripts.clouds import Clouds
 from player import Player
-from scripts.particle import Particle
+from scripts.particle import ParticlePool
 from scripts.deathanim import DeathAnimation
+from scripts.observation import ObservationEncoder
+from scripts.reward import RewardShaper
+from level_pool import LevelPool
 import random
+import struct
+
+# scroll, frame, finished, has checkpoint, checkpoint cell, level id
+ENV_STATE = struct.Struct('<2dq??iiI')
+# Mersenne Twister words + position, gauss_next
+RNG_STATE = struct.Struct('<625I?d')
 
 class Environment:
-    def __init__(self, game, display, player1=None, player2=None):
+    def __init__(self, game=None, display=None, player1=None, player2=None, headless=False, particles=True, seed=None, map_path=DEFAULT_MAP_PATH, shaping=None, levels=None, encoded=False):
         self.game = game
         self.display = display
-        self.assets = game.assets
+        # headless: no display, no assets, no particles - just the physics
+        self.headless = headless or game is None
+        self.assets = game.assets if game else None
+        self.width, self.height = display.get_size() if display else (DISPLAY_WIDTH, DISPLAY_HEIGHT)
 
         self.player1 = player1
-
-        self.clouds = Clouds(self.assets['clouds'], count=CLOUD_COUNT)
-        self.tilemap = Tilemap(game, tile_size=TILE_SIZE)
-        self.tilemap.load(DEFAULT_MAP_PATH)
         
-        self.pos = self.tilemap.extract([('spawners', 0), ('spawners', 1)])
-        self.default_pos = self.pos[0]['pos'] if self.pos else [10, 10]
-        self.player = Player(game, self.default_pos, PLAYER_SIZE)
+        # every random draw goes through this, and time is counted in frames
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.frame = 0
+
+        self.clouds = None if self.headless else Clouds(self.assets['clouds'], count=CLOUD_COUNT, rng=self.rng)
+        # levels: a LevelPool to switch between with reset(level_id=...),
+        # otherwise a pool of just map_path
+        if levels is None:
+            levels = LevelPool(game)
+            levels.add_map(map_path)
+        self.levels = levels
+        level = levels[0]
+        self.level_id = 0
+        self.tilemap = level.tilemap
+        self.map_path = level.name
+        self.pos = level.spawners
+        self.default_pos = level.default_pos
+        self.player = Player(game, self.default_pos, PLAYER_SIZE, environment=self)
         
-        self.particles = []
+        # None when particles are off, nothing spawns them then
+        self.particles = ParticlePool(game) if particles and not self.headless else None
         self.scroll = [10, 10]
+        # scroll and player position before the last update, render() can
+        # draw in between; None snaps to the current frame
+        self.previous = None
         
         self.death_animation = DeathAnimation(game)
+        self.finished = False
+        # cell of the last checkpoint touched this episode, respawns go there
+        self.checkpoint = None
+        
+        # shaping: RewardShaper keyword arguments, one shaper and distance
+        # field per level, built the first time the level is used
+        self.shaping = shaping or {}
+        self.shapers = {0: RewardShaper(self.tilemap, **self.shaping)}
+        self.reward = self.shapers[0]
+        self.reward.reset(self.player)
+        
+        self.debug_font = None
+        self.encoder = ObservationEncoder(self.tilemap)
+        # encoded: reset/step return encode_observation() instead of the
+        # legacy tuple of player values
+        self.encoded = encoded
+        # a PixelObservation here makes reset/step return stacked frames
+        self.pixels = None
 
     def update(self):
+        self.frame += 1
+        self.previous = (self.scroll[0], self.scroll[1], self.player.pos[0], self.player.pos[1])
         reset_player = self.death_animation.update()
         if reset_player is True:
-            self.player.pos = self.default_pos.copy()
-            self.player.reset()
+            self.player.reset(self.respawn_pos())
+            self.reward.reset(self.player)
+            # a respawn is a jump, not a movement to draw in between
+            self.previous = None
         
-        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / CAMERA_SPEED
-        self.scroll[1] += (self.player.rect().centery - self.display.get_height() * 0.65 - self.scroll[1]) / CAMERA_SPEED
+        self.scroll[0] += (self.player.rect().centerx - self.width / 2 - self.scroll[0]) / CAMERA_SPEED
+        self.scroll[1] += (self.player.rect().centery - self.height * 0.65 - self.scroll[1]) / CAMERA_SPEED
         
-        self.clouds.update()
+        if self.clouds:
+            self.clouds.update()
         
         if not self.death_animation.is_dying:
             self.player.handle_movement(self.tilemap)
             
             if self.tilemap.spike_check(self.player.rect()):
                 self.trigger_death()
+            else:
+                checkpoint = self.tilemap.checkpoint_check(self.player.rect())
+                if checkpoint is not None:
+                    self.checkpoint = checkpoint
         
-        for particle in self.particles.copy():
-            kill = particle.update()
-            if kill:
-                self.particles.remove(particle)
+        if self.particles is not None:
+            self.particles.update()
                 
         self.handle_finish()
         
@@ -60,55 +111,175 @@ class Environment:
         if not self.death_animation.is_dying:
             self.death_animation.start(self.player.rect().center)
             
+            if self.particles is None:
+                return
             for _ in range(20):
-                self.particles.append(
-                    Particle(self.game, 'particle', 
-                            self.death_animation.death_pos, 
-                            velocity=[random.uniform(-2, 2), random.uniform(-2, 2)], 
-                            frame=random.randint(0, 7))
-                )
+                self.particles.spawn(self.death_animation.death_pos, 
+                                     velocity=[self.rng.uniform(-2, 2), self.rng.uniform(-2, 2)], 
+                                     frame=self.rng.randint(0, 7))
     
-    def render(self, display, debug=False):
-        render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+    def render(self, display, debug=False, scenery=True, alpha=1.0):
+        # alpha: how far from the previous update to the current one to draw
+        scroll = self.scroll
+        player_offset = None
+        if alpha < 1.0 and self.previous is not None:
+            scroll_x, scroll_y, player_x, player_y = self.previous
+            scroll = [scroll_x + (self.scroll[0] - scroll_x) * alpha, scroll_y + (self.scroll[1] - scroll_y) * alpha]
+            # the player is drawn at its own pos, shifting its offset moves it back
+            player_offset = (int(scroll[0]) + (self.player.pos[0] - player_x) * (1 - alpha),
+                             int(scroll[1]) + (self.player.pos[1] - player_y) * (1 - alpha))
+        render_scroll = (int(scroll[0]), int(scroll[1]))
         
-        display.blit(self.assets['background'], (0, 0))
+        if scenery:
+            display.blit(self.assets['background'], (0, 0))
+        else:
+            display.fill((0, 0, 0))
         
         if debug:
+            if self.debug_font is None:
+                self.debug_font = pygame.font.Font(FONT, 10)
             fps = str(int(self.game.clock.get_fps()))
-            font = pygame.font.Font(FONT, 10)  
-            fps_text = font.render(fps, True, pygame.Color("RED"))
+            fps_text = self.debug_font.render(fps, True, pygame.Color("RED"))
             display.blit(fps_text, (0, 0))
         
-        self.clouds.render(display, offset=render_scroll)
+        if scenery:
+            self.clouds.render(display, offset=render_scroll)
         
         self.tilemap.render(display, offset=render_scroll)
         
-        temp_surface = pygame.Surface((display.get_width(), display.get_height()), pygame.SRCALPHA)
+        # outlines are baked into the atlas frames, one blit per sprite
+        self.player.render(display, offset=player_offset or render_scroll)
         
-        self.player.render(temp_surface, offset=render_scroll)
+        if self.particles is not None:
+            self.particles.render(display, offset=render_scroll)
         
-        for particle in self.particles:
-            particle.render(temp_surface, offset=render_scroll)
-        
-        temp_mask = pygame.mask.from_surface(temp_surface)   
-        white_silhouette = temp_mask.to_surface(setcolor=(255, 255, 255), unsetcolor=TRANSPARENT)
-        for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            display.blit(white_silhouette, offset)
-            
-        display.blit(temp_surface, (0, 0))
-        
-        self.death_animation.render(display, self.scroll)
+        self.death_animation.render(display, scroll)
 
+    def respawn_pos(self):
+        if self.checkpoint is None:
+            return self.default_pos
+        return self.tilemap.checkpoints[self.checkpoint]
+    
     def handle_finish(self):
         if self.tilemap.finishline_check(self.player.rect()):
-            pass  
+            self.finished = True
+    
+    def use_level(self, level_id):
+        # O(1): the pool has loaded and compiled every level already
+        level = self.levels[level_id]
+        self.level_id = level_id
+        self.tilemap = level.tilemap
+        self.map_path = level.name
+        self.pos = level.spawners
+        self.default_pos = level.default_pos
+        self.player.originalpos = list(level.default_pos)
+        self.encoder.tilemap = level.tilemap
+        if level_id not in self.shapers:
+            self.shapers[level_id] = RewardShaper(level.tilemap, **self.shaping)
+        self.reward = self.shapers[level_id]
     
-    def reset(self):
-        self.player.pos = self.default_pos.copy()
-        self.player.reset()
-        self.particles.clear()
+    def reset(self, seed=None, level_id=None):
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        if level_id is not None and level_id != self.level_id:
+            self.use_level(level_id)
+        self.frame = 0
+        self.checkpoint = None
+        self.player.reset(self.default_pos)
+        if self.particles is not None:
+            self.particles.clear()
         self.scroll = [10, 10]
-        self.death_animation.start(None) 
+        self.previous = None
+        self.finished = False
+        if self.headless:
+            # skip the 80 frame respawn transition, nobody is watching it
+            self.death_animation = DeathAnimation(self.game)
+        else:
+            self.death_animation.start(None) 
+        self.reward.reset(self.player)
+        if self.pixels is not None:
+            return self.pixels.reset()
+        return self.observation()
+    
+    def get_state(self):
+        # fixed layout blob for search algorithms: restore it with set_state
+        # instead of reset() to jump back to any earlier frame
+        version, words, gauss_next = self.rng.getstate()
+        checkpoint = self.checkpoint or (0, 0)
+        parts = [ENV_STATE.pack(self.scroll[0], self.scroll[1], self.frame, self.finished,
+                                self.checkpoint is not None, checkpoint[0], checkpoint[1], self.level_id),
+                 RNG_STATE.pack(*words, gauss_next is not None, gauss_next or 0.0),
+                 self.player.get_state(),
+                 self.death_animation.get_state()]
+        if self.particles is not None:
+            parts.append(self.particles.get_state())
+        if self.clouds:
+            parts.append(self.clouds.get_state())
+        return b''.join(parts)
+    
+    def set_state(self, blob):
+        # only valid for blobs from an Environment with the same map and options
+        blob = memoryview(blob)
+        (scroll_x, scroll_y, self.frame, self.finished,
+         has_checkpoint, checkpoint_x, checkpoint_y, level_id) = ENV_STATE.unpack_from(blob)
+        if level_id != self.level_id:
+            self.use_level(level_id)
+        self.scroll = [scroll_x, scroll_y]
+        self.previous = None
+        self.checkpoint = (checkpoint_x, checkpoint_y) if has_checkpoint else None
+        offset = ENV_STATE.size
+        *words, has_gauss, gauss_next = RNG_STATE.unpack_from(blob, offset)
+        self.rng.setstate((3, tuple(words), gauss_next if has_gauss else None))
+        offset += RNG_STATE.size
+        self.player.set_state(blob[offset:offset + self.player.STATE.size])
+        offset += self.player.STATE.size
+        self.death_animation.set_state(blob[offset:offset + self.death_animation.STATE.size])
+        offset += self.death_animation.STATE.size
+        if self.particles is not None:
+            size = self.particles.state_size()
+            self.particles.set_state(blob[offset:offset + size])
+            offset += size
+        if self.clouds:
+            size = self.clouds.state_size()
+            self.clouds.set_state(blob[offset:offset + size])
+            offset += size
+        self.reward.reset(self.player)
+    
+    def step(self, action, state, repeat=1):
+        # the same input for up to `repeat` frames, cut short by death or finish;
+        # nothing is rendered until the last of them, and only for pixels
+        died = False
+        frames = dashes = 0
+        for _ in range(repeat):
+            was_dying = self.death_animation.is_dying
+            dash_count = self.player.dash_count
+            
+            self.move(action, state)
+            dashes += self.player.dash_count < dash_count
+            self.update()
+            frames += 1
+            
+            died = self.death_animation.is_dying and not was_dying
+            if died or self.finished:
+                break
+        done = died or self.finished
+        reward = self.reward.reward(self.player, frames, died, self.finished, dashes)
+        
+        obs = self.pixels.observe() if self.pixels is not None else self.observation()
+        return obs, reward, done, {'death': died, 'finish': self.finished}
+    
+    def observation(self):
+        return self.encode_observation() if self.encoded else self.get_observation()
+    
+    def get_observation(self):
+        player = self.player
+        return (player.pos[0], player.pos[1], player.velocity[0], player.velocity[1],
+                player.dashing, player.dash_count, player.stamina, player.jumps)
+    
+    def encode_observation(self, out=None):
+        # fixed-size vector for learning agents, written into out if given
+        return self.encoder.encode(self.player, out)
     
     def move(self, action, state):
         self.player.stop_movement()
@@ -127,8 +298,8 @@ class Environment:
             self.player.start_dash(True, action)
         
     def create_particle(self, particle_type, pos, velocity=None, frame=0):
+        if self.particles is None:
+            return
         if velocity is None:
             velocity = [0, 0]
-        self.particles.append(
-            Particle(self.game, particle_type, pos, velocity=velocity, frame=frame)
-        )
\ No newline at end of file
+        self.particles.spawn(pos, velocity=velocity, frame=frame)
@@ -1,62 +1,63 @@
+import os
 import sys
+import random
 import pygame
-from scripts.utils import load_image, load_images, Animation
+from scripts.assets import assets
+from scripts.atlas import SpriteAtlas
+from scripts.replay import Replay
 from environment import Environment
 from Constants import *
 from human_agent import HumanAgentWASD  
 
 class Game:
-    def __init__(self, screen=None):
+    simulated = True
+
+    def __init__(self, screen=None, clock=None):
         pygame.init()
         pygame.display.set_caption(GAME_TITLE)
         
         self.screen = screen if screen else pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.display = pygame.Surface((DISPLAY_WIDTH, DISPLAY_HEIGHT))
-        self.clock = pygame.time.Clock()
+        self.clock = clock if clock else pygame.time.Clock()
         
         self.agent = HumanAgentWASD()
         
-        self.assets = {
-            'decor': load_images('tiles/decor'),
-            'grass': load_images('tiles/grass'),
-            'large_decor': load_images('tiles/large_decor'),
-            'stone': load_images('tiles/stone'),
-            'player': load_image('entities/player.png'),
-            'background': load_image('background.png'),
-            'clouds': load_images('clouds'),
-            'spikes': load_images('tiles/spikes'),
-            'checkpoint': load_images('tiles/Checkpoint'),
-            'player/idle': Animation(load_images('entities/player/idle'), img_dur=IDLE_ANIMATION_DURATION),
-            'player/run': Animation(load_images('entities/player/run'), img_dur=RUN_ANIMATION_DURATION),
-            'player/jump': Animation(load_images('entities/player/jump')),
-            'player/slide': Animation(load_images('entities/player/slide')),
-            'player/wall_slide': Animation(load_images('entities/player/wall_slide')),
-            'particle/particle': Animation(load_images('particles/particle'), img_dur=PARTICLE_ANIMATION_DURATION, loop=False),
-        }
+        if os.path.exists(ASSET_PACK_PATH):
+            assets.load_pack(ASSET_PACK_PATH)
+        self.assets = assets
+        self.atlas = SpriteAtlas({key: self.assets[key] for key in (
+            'player/idle', 'player/run', 'player/jump', 'player/slide', 'player/wall_slide', 'particle/particle')})
         
         self.music = pygame.mixer.Sound(MUSIC)
         self.music.set_volume(0.05)
         
-        self.environment = Environment(self, self.display)
+        self.seed = random.randrange(2 ** 32)
+        self.environment = Environment(self, self.display, seed=self.seed)
+        self.replay = Replay(self.seed, self.environment.map_path, self.environment.level_id)
         
-    def run(self):
-        self.music.play(-1)
+    def enter(self):
+        if not self.music.get_num_channels():
+            self.music.play(-1)
+        # nothing was simulated while another state was shown
+        self.environment.previous = None
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.replay.save(REPLAY_PATH, self.environment)
+            pygame.quit()
+            sys.exit()
+
+    def update(self):
+        # one fixed physics step, the Launcher decides how many per frame
+        action = self.agent.get_action()
+        state = self.agent.get_state()
+        self.replay.record(action, state)
+
+        self.environment.move(action, state)
         
-        while True:            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-            
-            action = self.agent.get_action()
-            state = self.agent.get_state()
+        self.environment.update()
 
-            self.environment.move(action, state)
-            
-            self.environment.update()
-            
-            self.environment.render(self.display, debug=True)
-            
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-            pygame.display.update()
-            self.clock.tick(FPS)
\ No newline at end of file
+    def render(self, alpha=1.0):
+        self.environment.render(self.display, alpha=alpha)
+        # scaled straight into the window surface
+        pygame.transform.scale(self.display, self.screen.get_size(), self.screen)
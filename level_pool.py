@@ -0,0 +1,105 @@
+from collections import deque
+import random
+
+from Constants import TILE_SIZE, CURRICULUM_WINDOW, CURRICULUM_PROMOTE
+from scripts.tilemap import Tilemap
+
+
+class Level:
+    """A loaded and compiled map with its spawners already pulled out.
+
+    .pmap files keep spawners in the offgrid table, so pulling them out of a
+    mapped level leaves the shared grid pages untouched.
+    """
+    def __init__(self, tilemap, difficulty=0.0, name=None):
+        self.tilemap = tilemap
+        self.spawners = tilemap.extract([('spawners', 0), ('spawners', 1)])
+        self.default_pos = self.spawners[0]['pos'] if self.spawners else [10, 10]
+        self.difficulty = difficulty
+        self.name = name
+
+
+class LevelPool:
+    """Maps loaded once and kept, so an Environment can switch between them
+    without reading or compiling anything. Level ids are insertion indices.
+    """
+    def __init__(self, game=None):
+        self.game = game
+        self.levels = []
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, level_id):
+        return self.levels[level_id]
+
+    def add(self, tilemap, difficulty=0.0, name=None):
+        # always named, Environment.map_path and replays carry it
+        if name is None:
+            name = f'generated:{len(self.levels)}'
+        self.levels.append(Level(tilemap, difficulty, name))
+        return len(self.levels) - 1
+
+    def add_map(self, path, difficulty=0.0):
+        tilemap = Tilemap(self.game, tile_size=TILE_SIZE)
+        tilemap.load(path)
+        return self.add(tilemap, difficulty, path)
+
+    def add_data(self, map_data, difficulty=0.0, name=None):
+        # e.g. straight from scripts.levelgen.generate
+        tilemap = Tilemap(self.game, tile_size=TILE_SIZE)
+        tilemap.load_data(map_data)
+        return self.add(tilemap, difficulty, name)
+
+    @classmethod
+    def from_paths(cls, paths, game=None, difficulties=None):
+        pool = cls(game)
+        for i, path in enumerate(paths):
+            pool.add_map(path, difficulties[i] if difficulties else 0.0)
+        return pool
+
+
+class Curriculum:
+    """Picks the next level from a pool by difficulty and success rate.
+
+    Difficulties unlock in increasing order: once the success rate over the
+    last `window` episodes on unlocked levels reaches `promote`, the next
+    difficulty opens up. Among unlocked levels those solved about half the
+    time are drawn most, weight p * (1 - p) with unplayed levels at p = 0.5.
+    """
+    def __init__(self, pool, rng=None, window=CURRICULUM_WINDOW, promote=CURRICULUM_PROMOTE):
+        self.pool = pool
+        self.rng = rng or random.Random()
+        self.promote = promote
+        self.difficulties = sorted({level.difficulty for level in pool.levels})
+        self.stage = 0
+        self.results = [deque(maxlen=window) for _ in pool.levels]
+        self.recent = deque(maxlen=window)
+
+    @property
+    def ceiling(self):
+        return self.difficulties[self.stage]
+
+    def unlocked(self):
+        return [i for i, level in enumerate(self.pool.levels) if level.difficulty <= self.ceiling]
+
+    def success_rate(self, level_id):
+        results = self.results[level_id]
+        return sum(results) / len(results) if results else 0.5
+
+    def sample(self):
+        levels = self.unlocked()
+        weights = []
+        for level_id in levels:
+            p = self.success_rate(level_id)
+            # never quite zero, mastered levels still come back now and then
+            weights.append(max(p * (1 - p), 0.02))
+        return self.rng.choices(levels, weights)[0]
+
+    def record(self, level_id, success):
+        self.results[level_id].append(bool(success))
+        self.recent.append(bool(success))
+        full = len(self.recent) == self.recent.maxlen
+        if full and self.stage + 1 < len(self.difficulties) and sum(self.recent) / len(self.recent) >= self.promote:
+            self.stage += 1
+            self.recent.clear()
@@ -1,11 +1,20 @@
 import math
-import random
+import struct
 from Constants import *
 import pygame
 
+PLAYER_ACTIONS = ['', 'idle', 'run', 'jump', 'slide', 'wall_slide']
+DASH_DIRECTIONS = [(x, y) for x in (-1, 0, 1) for y in (-1, 0, 1)]
+COLLISION_SIDES = ['up', 'down', 'right', 'left']
+INPUT_FLAGS = ['moving_left', 'moving_right', 'is_jumping', 'is_dashing', 'is_grabbing']
+
 class Player:
-    def __init__(self, game, pos, size=PLAYER_SIZE):
+    # fixed snapshot layout, see get_state
+    STATE = struct.Struct('<4dB?qq?qqHbb?qddqBqBq')
+    
+    def __init__(self, game, pos, size=PLAYER_SIZE, environment=None):
         self.game = game
+        self.environment = environment
         self.type = 'player'
         self.originalpos = list(pos)
         self.pos = self.originalpos.copy()
@@ -14,6 +23,7 @@ class Player:
         self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
         
         self.action = ''
+        self.animation = None
         self.anim_offset = PLAYER_ANIMATION_OFFSET
         self.flip = False
         self.set_action('idle')
@@ -42,12 +52,12 @@ class Player:
         self.is_grabbing = False
         
         self.last_movement = [0, 0]
-        self.last_dash_time = 0
+        self.last_dash_frame = 0
 
-    def reset(self):
+    def reset(self, pos=None):
         self.action = ''
         self.set_action('idle')
-        self.pos = self.originalpos.copy()
+        self.pos = list(pos) if pos is not None else self.originalpos.copy()
         self.velocity = [0, 0]
         self.stamina = 110
         self.air_time = 0
@@ -62,23 +72,53 @@ class Player:
         self.is_dashing = False
         self.is_grabbing = False
         self.wall_jump_count = 0
-        self.last_dash_time = 0
+        self.last_dash_frame = 0
         
         self.create_reset_particles()
     
+    def get_state(self):
+        collisions = sum(1 << i for i, side in enumerate(COLLISION_SIDES) if self.collisions[side])
+        directions = sum(1 << i for i, direction in enumerate(DASH_DIRECTIONS) if direction in self.dash_directions)
+        inputs = sum(1 << i for i, name in enumerate(INPUT_FLAGS) if getattr(self, name))
+        return self.STATE.pack(
+            self.pos[0], self.pos[1], self.velocity[0], self.velocity[1],
+            collisions, self.flip, self.air_time, self.jumps, self.wall_slide,
+            self.dashing, self.dash_count, directions, self.dash_direction[0], self.dash_direction[1],
+            self.jump_held, self.jump_timer, self.jump_strength_multiplier, self.stamina,
+            self.wall_jump_count, inputs, self.last_dash_frame,
+            PLAYER_ACTIONS.index(self.action), self.animation.frame if self.animation else 0)
+    
+    def set_state(self, blob):
+        (pos_x, pos_y, velocity_x, velocity_y, collisions, self.flip, self.air_time, self.jumps,
+         self.wall_slide, self.dashing, self.dash_count, directions, dash_x, dash_y,
+         self.jump_held, self.jump_timer, self.jump_strength_multiplier, self.stamina,
+         self.wall_jump_count, inputs, self.last_dash_frame, action, frame) = self.STATE.unpack(blob)
+        self.pos = [pos_x, pos_y]
+        self.velocity = [velocity_x, velocity_y]
+        self.collisions = {side: bool(collisions >> i & 1) for i, side in enumerate(COLLISION_SIDES)}
+        self.dash_directions = {direction for i, direction in enumerate(DASH_DIRECTIONS) if directions >> i & 1}
+        self.dash_direction = (dash_x, dash_y)
+        for i, name in enumerate(INPUT_FLAGS):
+            setattr(self, name, bool(inputs >> i & 1))
+        self.action = ''
+        self.set_action(PLAYER_ACTIONS[action])
+        if self.animation:
+            self.animation.frame = frame
+    
     def create_reset_particles(self):
-        environment = self.game.environment
-        if environment:
+        environment = self.environment
+        if environment and environment.particles is not None:
+            rng = environment.rng
             for _ in range(15):
-                angle = random.random() * math.pi * 2
-                speed = random.uniform(0.5, 2)
+                angle = rng.random() * math.pi * 2
+                speed = rng.uniform(0.5, 2)
                 velocity = [math.cos(angle) * speed, math.sin(angle) * speed]
                 
                 environment.create_particle(
                     'particle', 
                     [self.pos[0] + self.size[0] // 2, self.pos[1] + self.size[1] // 2], 
                     velocity=velocity, 
-                    frame=random.randint(0, 7)
+                    frame=rng.randint(0, 7)
                 )
 
     def rect(self):
@@ -87,7 +127,8 @@ class Player:
     def set_action(self, action):
         if action != self.action:
             self.action = action
-            self.animation = self.game.assets[self.type + '/' + self.action].copy()
+            if self.game is not None:
+                self.animation = self.game.assets[self.type + '/' + self.action].copy()
     
     def handle_movement(self, tilemap):
         self.update(tilemap)
@@ -120,29 +161,7 @@ class Player:
         
         frame_movement = [self.velocity[0], self.velocity[1]]
         
-        self.pos[0] += frame_movement[0]
-        entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entity_rect.colliderect(rect):
-                if frame_movement[0] > 0:
-                    entity_rect.right = rect.left
-                    self.collisions['right'] = True
-                if frame_movement[0] < 0:
-                    entity_rect.left = rect.right
-                    self.collisions['left'] = True
-                self.pos[0] = entity_rect.x
-        
-        self.pos[1] += frame_movement[1]
-        entity_rect = self.rect()
-        for rect in tilemap.physics_rects_around(self.pos):
-            if entity_rect.colliderect(rect):
-                if frame_movement[1] > 0:
-                    entity_rect.bottom = rect.top
-                    self.collisions['down'] = True
-                if frame_movement[1] < 0:
-                    entity_rect.top = rect.bottom
-                    self.collisions['up'] = True
-                self.pos[1] = entity_rect.y
+        self._move_and_collide(tilemap, frame_movement)
         
         if movement_x > 0:
             self.flip = False
@@ -162,7 +181,7 @@ class Player:
             self.dash_count = 2  
             self.dash_directions.clear()
             self.wall_jump_count = 0 
-            self.last_dash_time = 0
+            self.last_dash_frame = 0
         
         if self.collisions['down']:
             self.stamina = min(110, self.stamina + 1)
@@ -203,7 +222,21 @@ class Player:
         
         self._update_dash()
         
-        self.animation.update()
+        if self.animation:
+            self.animation.update()
+    
+    def _move_and_collide(self, tilemap, frame_movement):
+        self.pos[0], hit = tilemap.sweep(self.pos, self.size, 0, frame_movement[0])
+        if hit > 0:
+            self.collisions['right'] = True
+        elif hit < 0:
+            self.collisions['left'] = True
+        
+        self.pos[1], hit = tilemap.sweep(self.pos, self.size, 1, frame_movement[1])
+        if hit > 0:
+            self.collisions['down'] = True
+        elif hit < 0:
+            self.collisions['up'] = True
     
     def _update_dash(self):
         if self.dashing > 0:
@@ -221,29 +254,29 @@ class Player:
             self.velocity[0] = direction_x * dash_power
             self.velocity[1] = direction_y * dash_power * 0.8
             
-            if abs(self.dashing) % 2 == 0:
+            environment = self.environment
+            if abs(self.dashing) % 2 == 0 and environment and environment.particles is not None:
+                rng = environment.rng
                 pvelocity = [
-                    -direction_x * random.random() * 3, 
-                    -direction_y * random.random() * 3
+                    -direction_x * rng.random() * 3, 
+                    -direction_y * rng.random() * 3
                 ]
-                environment = self.game.environment
-                if environment:
-                    environment.create_particle(
-                        'particle', 
-                        self.rect().center, 
-                        velocity=pvelocity, 
-                        frame=random.randint(0, 7)
-                    )
+                environment.create_particle(
+                    'particle', 
+                    self.rect().center, 
+                    velocity=pvelocity, 
+                    frame=rng.randint(0, 7)
+                )
     
     def render(self, surf, offset=(0, 0)):
         if abs(self.dashing) > PLAYER_DASH_DURATION - 10:
-            img = self.game.assets['player/slide'].img()
+            key, index = 'player/slide', self.game.assets['player/slide'].index()
         else:
-            img = self.animation.img()
+            key, index = self.type + '/' + self.action, self.animation.index()
         
-        surf.blit(pygame.transform.flip(img, self.flip, False), 
-                (self.pos[0] - offset[0] + self.anim_offset[0], 
-                self.pos[1] - offset[1] + self.anim_offset[1]))
+        self.game.atlas.blit(surf, key, index, self.flip, 
+                             (self.pos[0] - offset[0] + self.anim_offset[0], 
+                              self.pos[1] - offset[1] + self.anim_offset[1]))
     
     def move_left(self, active=True):
         self.moving_left = active
@@ -370,20 +403,21 @@ class Player:
             self.dashing = PLAYER_DASH_DURATION if not self.flip else -PLAYER_DASH_DURATION
         
         self.dash_count -= 1
-        self.last_dash_time = pygame.time.get_ticks()
+        self.last_dash_frame = self.environment.frame if self.environment else 0
         
         self._create_dash_particles(dash_direction)
         
         return True
         
     def _create_dash_particles(self, dash_direction):
-        environment = self.game.environment
-        if not environment:
+        environment = self.environment
+        if not environment or environment.particles is None:
             return
-            
+        
+        rng = environment.rng
         for _ in range(PARTICLE_COUNT_DASH): 
-            angle = random.random() * math.pi * 2
-            speed = random.random() * (PARTICLE_SPEED_MAX * 1.5 - PARTICLE_SPEED_MIN) + PARTICLE_SPEED_MIN
+            angle = rng.random() * math.pi * 2
+            speed = rng.random() * (PARTICLE_SPEED_MAX * 1.5 - PARTICLE_SPEED_MIN) + PARTICLE_SPEED_MIN
             pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
             offset = [
                 dash_direction[0] * 5 if dash_direction[0] != 0 else 0,
@@ -393,5 +427,5 @@ class Player:
                 'particle', 
                 [self.rect().centerx + offset[0], self.rect().centery + offset[1]], 
                 velocity=pvelocity, 
-                frame=random.randint(0, 7)
+                frame=rng.randint(0, 7)
             )
\ No newline at end of file
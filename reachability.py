@@ -0,0 +1,195 @@
+"""Solvability check for generated levels, and a parallel batch driver.
+
+    python reachability.py OUT_DIR --count 1000 --difficulty 0.5
+
+writes the first `count` solvable seeds as OUT_DIR/<seed>.pmap.
+"""
+import argparse
+import multiprocessing as mp
+import os
+
+import numpy as np
+from Constants import (TILE_SIZE, REACHABILITY_FRAMES, REACHABILITY_BEAM, REACHABILITY_MAX_DEPTH,
+                       REACHABILITY_BATCH)
+from scripts.levelgen import generate
+from scripts.reward import distance_field, UNREACHABLE
+from scripts.tilemap import Tilemap
+from vector_environment import VectorEnvironment
+
+# (action, state) pressed on the first frame of a macro, the action is then
+# held with no state: stand, run, jump in place or sideways, dash up or sideways
+MACROS = [(0, 0), (3, 0), (4, 0), (0, 1), (3, 1), (4, 1)] + [(action, 2) for action in (1, 3, 4, 5, 6)]
+MACRO_ACTIONS = np.array([action for action, state in MACROS])
+MACRO_STATES = np.array([state for action, state in MACROS])
+
+# empty rows above each stacked level, and the solid row between levels
+HEADROOM = 8
+SEPARATOR = 'stone'
+
+
+def stack_levels(levels):
+    """Levels in the map.json layout stacked top to bottom into one map.
+
+    A solid row between neighbours keeps players and the distance field of
+    one level out of the others. Returns the map, every level's spawn
+    position in pixels, the pixel row below which a player has fallen out
+    of its level and the separator rows, which load_stacked() closes across
+    the whole compiled grid.
+    """
+    tiles = {}
+    spawns = []
+    bottoms = []
+    separators = []
+    left = min(tile['pos'][0] for level in levels for tile in level['tilemap'].values()) - HEADROOM
+    right = max(tile['pos'][0] for level in levels for tile in level['tilemap'].values()) + HEADROOM
+    top = 0
+    for level in levels:
+        ys = [tile['pos'][1] for tile in level['tilemap'].values()]
+        shift = top + HEADROOM - min(ys)
+        spawn = [0, 0]
+        for tile in level['tilemap'].values():
+            x, y = tile['pos'][0], tile['pos'][1] + shift
+            if tile['type'] == 'spawners':
+                spawn = [x * TILE_SIZE, y * TILE_SIZE]
+                continue
+            tiles[str(x) + ';' + str(y)] = {'type': tile['type'], 'variant': tile['variant'], 'pos': [x, y]}
+        spawns.append(spawn)
+        bottom = max(ys) + shift + 1
+        bottoms.append(bottom * TILE_SIZE)
+        top = bottom + 2
+        separators.append(top)
+        for x in range(left, right + 1):
+            tiles[str(x) + ';' + str(top)] = {'type': SEPARATOR, 'variant': 0, 'pos': [x, top]}
+    return {'tilemap': tiles, 'tile_size': TILE_SIZE, 'offgrid': []}, spawns, bottoms, separators
+
+
+def load_stacked(levels):
+    # compile() pads the grid with GRID_MARGIN empty columns on both sides,
+    # the separators have to span those too or everything routes around them
+    map_data, spawns, bottoms, separators = stack_levels(levels)
+    tilemap = Tilemap(None, tile_size=TILE_SIZE)
+    tilemap.load_data(map_data)
+    ox = tilemap.grid_origin[0]
+    for y in separators:
+        for x in range(ox, ox + tilemap.grid_types.shape[1]):
+            tilemap.set_tile((x, y), SEPARATOR, 0)
+    return tilemap, spawns, bottoms
+
+
+def _state_keys(env, level):
+    # coarse enough to merge near-identical states, fine enough to keep
+    # everything that changes what the player can still do
+    return np.stack([
+        level, np.floor(env.pos[:, 0] / 8), np.floor(env.pos[:, 1] / 8),
+        np.round(env.velocity[:, 0]), np.round(env.velocity[:, 1] / 2),
+        env.dash_count, env.jumps, env.dashing != 0, env.wall_slide,
+    ], axis=1).astype(np.int64)
+
+
+def solvable(levels, frames=REACHABILITY_FRAMES, beam=REACHABILITY_BEAM, max_depth=REACHABILITY_MAX_DEPTH):
+    """Which of the levels can be finished, searched all at once.
+
+    Breadth-first from each spawner over macro actions, every state of one
+    depth stepped together with the real physics in a VectorEnvironment over
+    the stacked levels. Each depth keeps at most `beam` new states per level,
+    those closest to the finish by the tile distance field, so False can
+    also mean a level that needs a long detour; True always has a real input
+    sequence behind it.
+    """
+    tilemap, spawns, bottoms = load_stacked(levels)
+    distances = distance_field(tilemap)
+    rows, cols = distances.shape
+    ox, oy = tilemap.grid_origin
+    bottoms = np.array(bottoms)
+    solved = np.zeros(len(levels), dtype=bool)
+
+    env = VectorEnvironment(len(levels), tilemap=tilemap)
+    env.pos[:] = spawns
+    level = np.arange(len(levels))
+    visited = set()
+    for depth in range(max_depth):
+        n = env.num_envs
+        if not n:
+            break
+        env.gather(np.repeat(np.arange(n), len(MACROS)))
+        level = np.repeat(level, len(MACROS))
+        actions = np.tile(MACRO_ACTIONS, n)
+        states = np.tile(MACRO_STATES, n)
+        held = np.zeros(env.num_envs, dtype=np.int64)
+        alive = np.ones(env.num_envs, dtype=bool)
+        for frame in range(frames):
+            died, finished = env.advance(actions, states if frame == 0 else held)
+            solved[level[finished & alive]] = True
+            alive &= ~died
+        alive &= ~solved[level] & (env.pos[:, 1] < bottoms[level])
+
+        candidates = np.flatnonzero(alive)
+        keys, first = np.unique(_state_keys(env, level)[candidates], axis=0, return_index=True)
+        fresh = []
+        for key, index in zip(map(tuple, keys.tolist()), first.tolist()):
+            if key not in visited:
+                visited.add(key)
+                fresh.append(candidates[index])
+        fresh = np.array(fresh, dtype=np.int64)
+
+        # the beam: per level, the states with the shortest way left
+        gx = np.clip((np.trunc(env.pos[fresh, 0]).astype(np.int64) + env.size[0] // 2) // TILE_SIZE - ox, 0, cols - 1)
+        gy = np.clip((np.trunc(env.pos[fresh, 1]).astype(np.int64) + env.size[1] // 2) // TILE_SIZE - oy, 0, rows - 1)
+        distance = distances[gy, gx]
+        distance = np.where(distance == UNREACHABLE, rows * cols, distance)
+        order = np.lexsort((distance, level[fresh]))
+        fresh = fresh[order]
+        group = level[fresh]
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        rank = np.arange(len(fresh)) - np.repeat(starts, np.diff(np.r_[starts, len(fresh)]))
+        fresh = fresh[rank < beam]
+
+        env.gather(fresh)
+        level = level[fresh]
+    return solved.tolist()
+
+
+def is_solvable(level, **kwargs):
+    return solvable([level], **kwargs)[0]
+
+
+def check_seeds_batch(args):
+    seeds, difficulty = args
+    return list(zip(seeds, solvable([generate(seed, difficulty) for seed in seeds])))
+
+
+def check_seeds(seeds, difficulty=0.5, workers=None, batch=REACHABILITY_BATCH):
+    """(seed, solvable) for every seed over a process pool, a batch at a time."""
+    seeds = list(seeds)
+    batches = [(seeds[i:i + batch], difficulty) for i in range(0, len(seeds), batch)]
+    with mp.Pool(workers) as pool:
+        for results in pool.imap(check_seeds_batch, batches):
+            yield from results
+
+
+def save_level(seed, difficulty, path):
+    tilemap = Tilemap(None, tile_size=TILE_SIZE)
+    tilemap.load_data(generate(seed, difficulty))
+    tilemap.autotile()
+    tilemap.save(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='generate solvable levels')
+    parser.add_argument('out_dir')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--difficulty', type=float, default=0.5)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    found = 0
+    seeds = range(args.first_seed, args.first_seed + args.count * 2)
+    for seed, ok in check_seeds(seeds, args.difficulty, args.workers):
+        if ok:
+            save_level(seed, args.difficulty, os.path.join(args.out_dir, f'{seed}.pmap'))
+            found += 1
+            if found == args.count:
+                break
+    print(f'{found} solvable levels in {args.out_dir}')
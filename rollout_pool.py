@@ -0,0 +1,145 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from environment import Environment
+
+
+def _buffers(buf, num_envs, obs_size):
+    # fixed layout of the shared block, identical in the parent and every worker
+    layout = [
+        ('observations', np.float64, (num_envs, obs_size)),
+        ('rewards', np.float64, (num_envs,)),
+        ('dones', np.bool_, (num_envs,)),
+        ('actions', np.int64, (num_envs,)),
+        ('states', np.int64, (num_envs,)),
+    ]
+    buffers = {}
+    offset = 0
+    for name, dtype, shape in layout:
+        # each array starts on a multiple of its itemsize, the bool dones
+        # would otherwise leave the int64 arrays after it unaligned
+        itemsize = np.dtype(dtype).itemsize
+        offset = -(-offset // itemsize) * itemsize
+        array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        buffers[name] = array
+        offset += array.nbytes
+    return buffers, offset
+
+
+def _worker(remote, shm_name, num_envs, obs_size, indices, env_kwargs, seed, repeat):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buffers, _ = _buffers(shm.buf, num_envs, obs_size)
+    observations = buffers['observations']
+    rewards = buffers['rewards']
+    dones = buffers['dones']
+    actions = buffers['actions']
+    states = buffers['states']
+
+    # each environment gets its own stream, seed + its index in the pool
+    envs = [Environment(seed=None if seed is None else seed + i, **env_kwargs) for i in indices]
+    try:
+        while True:
+            cmd = remote.recv()
+            if cmd == 'step':
+                for env, i in zip(envs, indices):
+                    obs, reward, done, info = env.step(int(actions[i]), int(states[i]), repeat)
+                    if done:
+                        # death or finish: start over right away instead of
+                        # sitting through the DeathAnimation
+                        obs = env.reset()
+                    observations[i] = obs
+                    rewards[i] = reward
+                    dones[i] = done
+                remote.send(True)
+            elif cmd == 'reset':
+                for env, i in zip(envs, indices):
+                    observations[i] = env.reset()
+                    rewards[i] = 0.0
+                    dones[i] = False
+                remote.send(True)
+            elif cmd == 'close':
+                break
+    finally:
+        del observations, rewards, dones, actions, states, buffers
+        shm.close()
+        remote.close()
+
+
+class RolloutPool:
+    """K headless Environments spread over worker processes.
+
+    Observations, rewards and dones are written by the workers straight into
+    one shared memory block; the pipes only carry short commands. The arrays
+    returned by step/reset are views into that block and are overwritten by
+    the next call; copy them to keep them. Views still held at close() keep
+    the block mapped until they are dropped. Every step repeats the action
+    `repeat` frames.
+    """
+    def __init__(self, num_envs, num_workers=None, env_kwargs=None, context=None, seed=None, repeat=1):
+        self.num_envs = num_envs
+        self.num_workers = min(num_workers or mp.cpu_count(), num_envs)
+        env_kwargs = env_kwargs or {}
+
+        self.obs_size = np.asarray(Environment(**env_kwargs).reset()).size
+        _, nbytes = _buffers(None, num_envs, self.obs_size)
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.buffers, _ = _buffers(self.shm.buf, num_envs, self.obs_size)
+
+        ctx = mp.get_context(context)
+        self.remotes = []
+        self.processes = []
+        for indices in np.array_split(np.arange(num_envs), self.num_workers):
+            remote, worker_remote = ctx.Pipe()
+            process = ctx.Process(target=_worker, daemon=True,
+                                  args=(worker_remote, self.shm.name, num_envs, self.obs_size, indices.tolist(), env_kwargs, seed, repeat))
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        self.waiting = False
+        self.closed = False
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send('reset')
+        for remote in self.remotes:
+            remote.recv()
+        return self.buffers['observations']
+
+    def step_async(self, actions, states):
+        self.buffers['actions'][:] = actions
+        self.buffers['states'][:] = states
+        for remote in self.remotes:
+            remote.send('step')
+        self.waiting = True
+
+    def step_wait(self):
+        for remote in self.remotes:
+            remote.recv()
+        self.waiting = False
+        return self.buffers['observations'], self.buffers['rewards'], self.buffers['dones']
+
+    def step(self, actions, states):
+        self.step_async(actions, states)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self.step_wait()
+        for remote in self.remotes:
+            remote.send('close')
+        for process in self.processes:
+            process.join()
+        self.buffers = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # a caller still holds views from step/reset; the mapping goes
+            # away with them, the name is released below either way
+            pass
+        self.shm.unlink()
+        self.closed = True
@@ -2,6 +2,22 @@ class StateControl:
     def __init__(self, initial_state='menu'):
         self.currentState = initial_state
         self.previousStates = [initial_state]
+        # name -> object with enter(), handle_event(event), update(),
+        # render(alpha) and a simulated flag, driven one frame at a time by
+        # the Launcher loop
+        self.states = {}
+        self.entered = None
+
+    def addState(self, name, state):
+        self.states[name] = state
+
+    def activeState(self):
+        # enter() runs on the first frame after every switch
+        state = self.states[self.currentState]
+        if state is not self.entered:
+            self.entered = state
+            state.enter()
+        return state
 
     def getState(self):
         return self.currentState
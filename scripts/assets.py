@@ -0,0 +1,173 @@
+import os
+import struct
+import sys
+
+import pygame
+from Constants import (IDLE_ANIMATION_DURATION, RUN_ANIMATION_DURATION, PARTICLE_ANIMATION_DURATION,
+                       ASSET_PACK_PATH)
+from scripts.utils import BASE_IMG_PATH, load_image, load_images, Animation
+
+# key -> (kind, path under BASE_IMG_PATH, animation frame duration, animation loops)
+ASSET_SPECS = {
+    'decor': ('images', 'tiles/decor'),
+    'grass': ('images', 'tiles/grass'),
+    'large_decor': ('images', 'tiles/large_decor'),
+    'stone': ('images', 'tiles/stone'),
+    'spawners': ('images', 'tiles/spawners'),
+    'spikes': ('images', 'tiles/spikes'),
+    'checkpoint': ('images', 'tiles/Checkpoint'),
+    'player': ('image', 'entities/player.png'),
+    'background': ('image', 'background.png'),
+    'clouds': ('images', 'clouds'),
+    'player/idle': ('animation', 'entities/player/idle', IDLE_ANIMATION_DURATION, True),
+    'player/run': ('animation', 'entities/player/run', RUN_ANIMATION_DURATION, True),
+    'player/jump': ('animation', 'entities/player/jump', 5, True),
+    'player/slide': ('animation', 'entities/player/slide', 5, True),
+    'player/wall_slide': ('animation', 'entities/player/wall_slide', 5, True),
+    'particle/particle': ('animation', 'particles/particle', PARTICLE_ANIMATION_DURATION, False),
+}
+
+# magic, version, image count; then per image: key length, frame index, width, height
+PACK_HEADER = struct.Struct('<4sBI')
+PACK_ENTRY = struct.Struct('<BHHH')
+PACK_MAGIC = b'PMAT'
+PACK_VERSION = 1
+TEXT_CACHE_SIZE = 512
+
+
+class AssetManager:
+    """Images, animations, fonts and rendered text, each loaded the first time
+    it is asked for and then shared by everything in the process.
+
+    Indexing works like the old per-class asset dicts, so Tilemap, Player and
+    friends take it in place of one. With a pack file loaded, image data
+    comes from that single read instead of one file per frame.
+    """
+    def __init__(self, specs=ASSET_SPECS):
+        self.specs = specs
+        self.cache = {}
+        self.packed = {}
+        self.files = {}
+        self.fonts = {}
+        self.texts = {}
+        self.counts = {}
+
+    def __getitem__(self, key):
+        if key not in self.cache:
+            self.cache[key] = self._load(key)
+        return self.cache[key]
+
+    def __contains__(self, key):
+        return key in self.specs
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def _frames(self, key):
+        kind, path = self.specs[key][:2]
+        if key in self.packed:
+            # the same treatment load_image gives a file
+            frames = []
+            for pixels, size in self.packed.pop(key):
+                img = pygame.image.frombuffer(pixels, size, 'RGB').convert()
+                img.set_colorkey((0, 0, 0))
+                frames.append(img)
+            return frames
+        if kind == 'image':
+            return [load_image(path)]
+        return load_images(path)
+
+    def _load(self, key):
+        kind = self.specs[key][0]
+        frames = self._frames(key)
+        if kind == 'image':
+            return frames[0]
+        if kind == 'animation':
+            img_dur, loop = self.specs[key][2:]
+            return Animation(frames, img_dur=img_dur, loop=loop)
+        return frames
+
+    def count(self, key):
+        # frames under a key, without decoding any of them
+        kind, path = self.specs[key][:2]
+        if kind == 'image':
+            return 1
+        if key in self.cache:
+            frames = self.cache[key]
+            return len(frames.images) if kind == 'animation' else len(frames)
+        if key in self.packed:
+            return len(self.packed[key])
+        if key not in self.counts:
+            self.counts[key] = len(os.listdir(BASE_IMG_PATH + path))
+        return self.counts[key]
+
+    def image_file(self, path):
+        # plain files outside the specs (menu art), loaded as is, once
+        if path not in self.files:
+            self.files[path] = pygame.image.load(path)
+        return self.files[path]
+
+    def font(self, path, size):
+        if (path, size) not in self.fonts:
+            self.fonts[(path, size)] = pygame.font.Font(path, size)
+        return self.fonts[(path, size)]
+
+    def sys_font(self, name, size):
+        if (name, size, True) not in self.fonts:
+            self.fonts[(name, size, True)] = pygame.font.SysFont(name, size)
+        return self.fonts[(name, size, True)]
+
+    def text(self, string, font, size, color, antialias=True):
+        # font is a path, as for font(); colors may be names or tuples
+        key = (string, font, size, str(color), antialias)
+        if key not in self.texts:
+            if len(self.texts) >= TEXT_CACHE_SIZE:
+                self.texts.clear()
+            self.texts[key] = self.font(font, size).render(string, antialias, color)
+        return self.texts[key]
+
+    def pack(self, path=ASSET_PACK_PATH):
+        # every image of every spec, raw RGB, in one file
+        entries = []
+        for key, spec in self.specs.items():
+            kind, source = spec[:2]
+            if kind == 'image':
+                files = [BASE_IMG_PATH + source]
+            else:
+                files = [BASE_IMG_PATH + source + '/' + name for name in sorted(os.listdir(BASE_IMG_PATH + source))]
+            for index, file in enumerate(files):
+                entries.append((key, index, pygame.image.load(file)))
+        with open(path, 'wb') as f:
+            f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(entries)))
+            for key, index, img in entries:
+                name = key.encode()
+                f.write(PACK_ENTRY.pack(len(name), index, img.get_width(), img.get_height()) + name)
+                f.write(pygame.image.tobytes(img, 'RGB'))
+
+    def load_pack(self, path=ASSET_PACK_PATH):
+        # one read; each key's frames are still only converted when first used
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, count = PACK_HEADER.unpack_from(data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f'{path} is not a version {PACK_VERSION} asset pack')
+        offset = PACK_HEADER.size
+        view = memoryview(data)
+        packed = {}
+        for _ in range(count):
+            length, index, width, height = PACK_ENTRY.unpack_from(data, offset)
+            offset += PACK_ENTRY.size
+            key = data[offset:offset + length].decode()
+            offset += length
+            size = width * height * 3
+            packed.setdefault(key, []).append((view[offset:offset + size], (width, height)))
+            offset += size
+        # keys already loaded keep what they have
+        self.packed.update((key, frames) for key, frames in packed.items() if key not in self.cache)
+
+assets = AssetManager()
+
+
+if __name__ == '__main__':
+    # python -m scripts.assets [PATH]: write the pack file
+    assets.pack(sys.argv[1] if len(sys.argv) > 1 else ASSET_PACK_PATH)
@@ -0,0 +1,46 @@
+import pygame
+from Constants import WHITE, TRANSPARENT
+
+OUTLINE_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def outlined(img, color=WHITE):
+    # the sprite over its silhouette shifted one pixel each way, 1px border added
+    glyph = pygame.mask.from_surface(img).to_surface(setcolor=color, unsetcolor=TRANSPARENT)
+    surf = pygame.Surface((img.get_width() + 2, img.get_height() + 2), pygame.SRCALPHA)
+    for offset in OUTLINE_OFFSETS:
+        surf.blit(glyph, (1 + offset[0], 1 + offset[1]))
+    surf.blit(img, (1, 1))
+    return surf
+
+
+class SpriteAtlas:
+    """Every frame of the given animations, outlined, flipped and unflipped,
+    packed into one surface so that drawing a sprite is a single blit."""
+    def __init__(self, animations, width=256, padding=1):
+        frames = []
+        for key, animation in animations.items():
+            for index, img in enumerate(animation.images):
+                for flip in (False, True):
+                    frames.append(((key, index, flip), outlined(pygame.transform.flip(img, flip, False))))
+
+        # shelf packing, tallest frames first
+        frames.sort(key=lambda frame: frame[1].get_height(), reverse=True)
+        self.regions = {}
+        x = y = shelf = 0
+        for key, surf in frames:
+            if x + surf.get_width() > width:
+                x = 0
+                y += shelf + padding
+                shelf = 0
+            self.regions[key] = pygame.Rect(x, y, surf.get_width(), surf.get_height())
+            x += surf.get_width() + padding
+            shelf = max(shelf, surf.get_height())
+
+        self.surface = pygame.Surface((width, y + shelf), pygame.SRCALPHA)
+        for key, surf in frames:
+            self.surface.blit(surf, self.regions[key])
+
+    def blit(self, surf, key, index, flip, pos):
+        # pos is where the plain sprite would go, the outline sits 1px outside it
+        surf.blit(self.surface, (pos[0] - 1, pos[1] - 1), self.regions[(key, index, flip)])
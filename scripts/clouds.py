@@ -1,4 +1,5 @@
 import random
+import struct
 
 class Cloud:
     def __init__(self, pos, img, speed, depth):
@@ -15,14 +16,25 @@ class Cloud:
         surf.blit(self.img, (render_pos[0] % (surf.get_width() + self.img.get_width()) - self.img.get_width(), render_pos[1] % (surf.get_height() + self.img.get_height()) - self.img.get_height()))
         
 class Clouds:
-    def __init__(self, cloud_images, count=16):
+    def __init__(self, cloud_images, count=16, rng=random):
         self.clouds = []
         
         for i in range(count):
-            self.clouds.append(Cloud((random.random() * 99999, random.random() * 99999), random.choice(cloud_images), 0.6 + random.random(), random.random() * 0.6 + 0.2))
+            self.clouds.append(Cloud((rng.random() * 99999, rng.random() * 99999), rng.choice(cloud_images), 0.6 + rng.random(), rng.random() * 0.6 + 0.2))
         
         self.clouds.sort(key=lambda x: x.depth)
     
+    def state_size(self):
+        return len(self.clouds) * 16
+    
+    def get_state(self):
+        return struct.pack(f'<{len(self.clouds) * 2}d', *(v for cloud in self.clouds for v in cloud.pos))
+    
+    def set_state(self, blob):
+        values = struct.unpack(f'<{len(self.clouds) * 2}d', blob)
+        for i, cloud in enumerate(self.clouds):
+            cloud.pos = [values[i * 2], values[i * 2 + 1]]
+    
     def update(self):
         for cloud in self.clouds:
             cloud.update()
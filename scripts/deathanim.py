@@ -1,7 +1,12 @@
 # death_animation.py
+import struct
+
 import pygame
 
 class DeathAnimation:
+    # timer, active, is_dying, radii, has death_pos, death_pos
+    STATE = struct.Struct('<q??dd?dd')
+    
     def __init__(self, game):
         self.game = game
         
@@ -19,6 +24,7 @@ class DeathAnimation:
         self.respawn_radius = self.min_radius  
         self.active = False
         self.is_dying = False
+        self.transition_surf = None
         
     def start(self, death_pos=None):
         self.active = True
@@ -28,6 +34,16 @@ class DeathAnimation:
         self.death_radius = self.max_radius
         self.respawn_radius = self.min_radius
         
+    def get_state(self):
+        death_pos = self.death_pos or (0, 0)
+        return self.STATE.pack(self.timer, self.active, self.is_dying, self.death_radius, self.respawn_radius,
+                               self.death_pos is not None, death_pos[0], death_pos[1])
+    
+    def set_state(self, blob):
+        (self.timer, self.active, self.is_dying, self.death_radius, self.respawn_radius,
+         has_pos, pos_x, pos_y) = self.STATE.unpack(blob)
+        self.death_pos = (pos_x, pos_y) if has_pos else None
+        
     def update(self):
         if not self.active:
             return False
@@ -63,8 +79,9 @@ class DeathAnimation:
             return
             
         render_scroll = (int(scroll[0]), int(scroll[1]))
-        width, height = display.get_size()
-        transition_surf = pygame.Surface((width, height), pygame.SRCALPHA)
+        if self.transition_surf is None or self.transition_surf.get_size() != display.get_size():
+            self.transition_surf = pygame.Surface(display.get_size(), pygame.SRCALPHA)
+        transition_surf = self.transition_surf
         
         if self.timer <= self.death_anim_duration and self.death_pos:
             transition_surf.fill((0, 0, 0, 255))
@@ -80,9 +97,10 @@ class DeathAnimation:
             
         else:
             transition_surf.fill((0, 0, 0, 255))
+            respawn_pos = self.game.environment.respawn_pos()
             spawn_screen_pos = (
-                self.game.environment.default_pos[0] - render_scroll[0],
-                self.game.environment.default_pos[1] - render_scroll[1]
+                respawn_pos[0] - render_scroll[0],
+                respawn_pos[1] - render_scroll[1]
             )
             if self.respawn_radius > 0:
                 pygame.draw.circle(transition_surf, (0, 0, 0, 0), spawn_screen_pos, self.respawn_radius)
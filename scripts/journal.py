@@ -0,0 +1,271 @@
+import json
+import os
+import queue
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+from scripts import mapfile
+from Constants import JOURNAL_LIMIT, AUTOSAVE_COMPACT_EVERY
+
+
+def apply(tilemap, record):
+    """Writes one journal record into the tilemap.
+
+    A record holds absolute values, cells as [x, y, type, variant] or [x, y]
+    for an empty cell and offgrid tiles as [added, type, variant, x, y], so
+    applying it twice or on top of a newer snapshot gives the same map.
+    """
+    for cell in record['cells']:
+        if len(cell) == 2:
+            tilemap.remove_tile(cell)
+        else:
+            tilemap.set_tile(cell[:2], cell[2], cell[3])
+        # the recorded variants are already autotiled
+        tilemap.dirty.discard((cell[0], cell[1]))
+    for added, tile_type, variant, x, y in record['offgrid']:
+        existing = _find_offgrid(tilemap, tile_type, variant, x, y)
+        if added and existing is None:
+            tilemap.add_offgrid({'type': tile_type, 'variant': variant, 'pos': [x, y]})
+        elif not added and existing is not None:
+            tilemap.remove_offgrid(existing)
+
+
+def _find_offgrid(tilemap, tile_type, variant, x, y):
+    for tile in tilemap.offgrid_in((x, y, 1, 1)):
+        if tile['type'] == tile_type and tile['variant'] == variant and tile['pos'][0] == x and tile['pos'][1] == y:
+            return tile
+    return None
+
+
+def _cell(x, y, value):
+    return [x, y] if value is None else [x, y, value[0], value[1]]
+
+
+class EditJournal:
+    """Undo/redo for the editor, one entry per click or drag.
+
+    Edits go through the journal instead of straight to the tilemap. Between
+    begin() and end() every cell keeps only its first old and latest new
+    value, so a drag across the map is a single compact entry. Finished
+    entries are also handed to the autosave, if there is one.
+    """
+    def __init__(self, tilemap, autosave=None, limit=JOURNAL_LIMIT):
+        self.tilemap = tilemap
+        self.autosave = autosave
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+        self.cells = None
+        self.offgrid = None
+
+    def _value(self, x, y):
+        tile = self.tilemap.tile_at(x, y)
+        return None if tile is None else (tile['type'], tile['variant'])
+
+    def _record_cell(self, x, y, before, after):
+        if (x, y) in self.cells:
+            self.cells[(x, y)][1] = after
+        else:
+            self.cells[(x, y)] = [before, after]
+
+    def begin(self):
+        if self.cells is None:
+            self.cells = {}
+            self.offgrid = []
+
+    def end(self):
+        if self.cells is None:
+            return
+        changed = [(pos, values) for pos, values in self.cells.items() if values[0] != values[1]]
+        undo = {'cells': [_cell(x, y, before) for (x, y), (before, after) in changed],
+                'offgrid': [[not added] + tile for added, tile in reversed(self.offgrid)]}
+        redo = {'cells': [_cell(x, y, after) for (x, y), (before, after) in changed],
+                'offgrid': [[added] + tile for added, tile in self.offgrid]}
+        self.cells = None
+        self.offgrid = None
+        if redo['cells'] or redo['offgrid']:
+            self.undo_stack.append((undo, redo))
+            self.redo_stack.clear()
+            self._save(redo)
+
+    def _save(self, record):
+        if self.autosave is not None:
+            self.autosave.append(record)
+
+    def _edit(self, edit, *args):
+        # single edits outside a stroke are an entry of their own
+        if self.cells is not None:
+            return edit(*args)
+        self.begin()
+        result = edit(*args)
+        self.end()
+        return result
+
+    def set_tile(self, pos, tile_type, variant):
+        return self._edit(self._set_tile, pos, tile_type, variant)
+
+    def _set_tile(self, pos, tile_type, variant):
+        x, y = int(pos[0]), int(pos[1])
+        before = self._value(x, y)
+        self.tilemap.set_tile((x, y), tile_type, variant)
+        self._record_cell(x, y, before, (tile_type, variant))
+
+    def remove_tile(self, pos):
+        return self._edit(self._remove_tile, pos)
+
+    def _remove_tile(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        tile = self.tilemap.remove_tile((x, y))
+        if tile is not None:
+            self._record_cell(x, y, (tile['type'], tile['variant']), None)
+        return tile
+
+    def add_offgrid(self, tile):
+        return self._edit(self._offgrid, tile, True)
+
+    def remove_offgrid(self, tile):
+        return self._edit(self._offgrid, tile, False)
+
+    def _offgrid(self, tile, added):
+        if added:
+            self.tilemap.add_offgrid(tile)
+        else:
+            self.tilemap.remove_offgrid(tile)
+        self.offgrid.append((added, [tile['type'], tile['variant'], tile['pos'][0], tile['pos'][1]]))
+
+    def autotile(self, full=False):
+        # the variants autotiling changes belong to the entry that caused them
+        return self._edit(self._autotile, full)
+
+    def _autotile(self, full):
+        changed = self.tilemap.autotile() if full else self.tilemap.autotile_dirty()
+        for x, y, old_variant in changed:
+            tile_type, variant = self._value(x, y)
+            self._record_cell(x, y, (tile_type, old_variant), (tile_type, variant))
+        return changed
+
+    def undo(self):
+        self.end()
+        if not self.undo_stack:
+            return False
+        undo, redo = self.undo_stack.pop()
+        apply(self.tilemap, undo)
+        self.redo_stack.append((undo, redo))
+        self._save(undo)
+        return True
+
+    def redo(self):
+        self.end()
+        if not self.redo_stack:
+            return False
+        undo, redo = self.redo_stack.pop()
+        apply(self.tilemap, redo)
+        self.undo_stack.append((undo, redo))
+        self._save(redo)
+        return True
+
+
+class Autosave:
+    """Journal records appended to a log by a writer thread.
+
+    The log applies on top of the .pmap snapshot, or on top of the map the
+    session started from while there is no snapshot yet. Every
+    `compact_every` records, and on save, the map is copied (the grids are a
+    few numpy copies) and the thread writes it as the snapshot, then empties
+    the log. The frame loop only ever puts items on a queue. Records are
+    absolute values, so a crash between the snapshot and the truncation just
+    replays a few already applied records. A clean exit removes both files.
+    """
+    def __init__(self, tilemap, path, compact_every=AUTOSAVE_COMPACT_EVERY):
+        self.tilemap = tilemap
+        self.snapshot_path = path + mapfile.EXTENSION
+        self.log_path = path + '.log'
+        self.compact_every = compact_every
+        self.pending = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def recover(self, source):
+        # what a crash left behind, unless `source` was saved after it
+        if os.path.exists(self.snapshot_path):
+            base = self.snapshot_path
+        elif os.path.exists(self.log_path):
+            base = source
+        else:
+            return False
+        stamp = os.path.getmtime(self.snapshot_path if base == self.snapshot_path else self.log_path)
+        if os.path.exists(source) and os.path.getmtime(source) > stamp:
+            return False
+        if os.path.exists(base):
+            self.tilemap.load(base)
+        if base == self.snapshot_path:
+            # detach from the file, the next compaction replaces it
+            for name in ('grid_types', 'grid_variants', 'grid_flags'):
+                setattr(self.tilemap, name, np.array(getattr(self.tilemap, name)))
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # cut off mid-write by the crash
+                        break
+                    apply(self.tilemap, record)
+        self.tilemap.dirty.clear()
+        return True
+
+    def append(self, record):
+        self.queue.put(('log', json.dumps(record, separators=(',', ':'))))
+        self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        tilemap = self.tilemap
+        for tile in tilemap.offgrid_tiles:
+            tilemap.type_id(tile['type'])
+        snapshot = SimpleNamespace(tile_size=tilemap.tile_size, grid_origin=tilemap.grid_origin,
+                                   grid_types=tilemap.grid_types.copy(), grid_variants=tilemap.grid_variants.copy(),
+                                   grid_flags=tilemap.grid_flags.copy(),
+                                   offgrid_tiles=[dict(tile) for tile in tilemap.offgrid_tiles],
+                                   type_names=list(tilemap.type_names), type_id=dict(tilemap.type_ids).__getitem__)
+        self.queue.put(('snapshot', snapshot))
+        self.pending = 0
+
+    def close(self):
+        self.queue.put(('close', None))
+        self.thread.join()
+
+    def remove(self):
+        # nothing to recover: after a clean exit, or when the files are stale.
+        # Only before the first append or after close(), the thread owns the log
+        for path in (self.snapshot_path, self.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _run(self):
+        # opened on the first record, remove() may still run before that
+        log = None
+        try:
+            while True:
+                kind, item = self.queue.get()
+                if kind == 'log':
+                    if log is None:
+                        log = open(self.log_path, 'a')
+                    log.write(item + '\n')
+                    # flushed per record, a crash loses at most the last edit
+                    log.flush()
+                elif kind == 'snapshot':
+                    # mapfile.save already writes a temp file and replaces;
+                    # the log's cell records expect spawners on the grid
+                    mapfile.save(item, self.snapshot_path, keep_spawners=True)
+                    if log is not None:
+                        log.close()
+                    log = open(self.log_path, 'w')
+                else:
+                    break
+        finally:
+            if log is not None:
+                log.close()
@@ -0,0 +1,56 @@
+import random
+
+from Constants import TILE_SIZE, LEVEL_PLATFORMS, LEVEL_CHECKPOINT_EVERY
+
+
+def _tile(tiles, tile_type, x, y, variant=0):
+    tiles[str(x) + ';' + str(y)] = {'type': tile_type, 'variant': variant, 'pos': [x, y]}
+
+
+def generate(seed, difficulty=0.5, platforms=LEVEL_PLATFORMS, checkpoint_every=LEVEL_CHECKPOINT_EVERY):
+    """A left-to-right run of platforms in the map.json layout.
+
+    Starts on a spawner, ends on a finish column, with a checkpoint on every
+    checkpoint_every-th platform. difficulty in [0, 1] widens the gaps,
+    raises the steps and adds spikes. The same seed always gives the same
+    level; whether it can be finished is for reachability.is_solvable to say.
+    """
+    rng = random.Random(seed)
+    tiles = {}
+
+    x, y = 0, 0
+    max_gap = 2 + round(3 * difficulty)
+    max_rise = 1 + round(2 * difficulty)
+    spike_chance = 0.6 * difficulty
+    for i in range(platforms + 1):
+        first = i == 0
+        last = i == platforms
+        if not first:
+            gap = rng.randint(1, max_gap)
+            x += gap
+            y += rng.randint(-max_rise, 2)
+            # a spike pit under the gap, two rows down
+            if rng.random() < spike_chance:
+                for pit_x in range(x - gap, x):
+                    _tile(tiles, 'spikes', pit_x, y + 2)
+                    _tile(tiles, 'stone', pit_x, y + 3)
+
+        length = 6 if first or last else rng.randint(max(2, 6 - round(3 * difficulty)), 8)
+        material = rng.choice(('grass', 'stone'))
+        for px in range(x, x + length):
+            _tile(tiles, material, px, y)
+            _tile(tiles, material, px, y + 1)
+
+        if first:
+            _tile(tiles, 'spawners', x + 1, y - 1)
+        elif last:
+            for fy in range(y - 3, y):
+                _tile(tiles, 'finish', x + length - 2, fy)
+        else:
+            if i % checkpoint_every == 0:
+                _tile(tiles, 'checkpoint', x + length // 2, y - 1)
+            elif length >= 5 and rng.random() < spike_chance:
+                _tile(tiles, 'spikes', x + rng.randint(2, length - 3), y - 1)
+        x += length
+
+    return {'tilemap': tiles, 'tile_size': TILE_SIZE, 'offgrid': []}
@@ -0,0 +1,98 @@
+import os
+import struct
+import sys
+
+import numpy as np
+
+# magic, version, tile size, grid origin x/y, grid rows/cols, type name count, offgrid count
+HEADER = struct.Struct('<4sBHiiIIHI')
+MAGIC = b'PMAP'
+VERSION = 1
+EXTENSION = '.pmap'
+# grid cells of this type are saved in the offgrid table
+SPAWNERS = 'spawners'
+OFFGRID = np.dtype([('type', '<u2'), ('variant', '<u2'), ('x', '<f8'), ('y', '<f8')])
+
+
+def save(tilemap, path, keep_spawners=False):
+    """Header, type name table, then the compiled grids and the offgrid table.
+
+    The grids are written as they are in memory, uint8 type ids, variants and
+    flags row by row, so load() can map them without parsing anything.
+    Spawner cells go to the end of the offgrid table instead, in grid order,
+    so pulling them out of a loaded level never writes to its mapped grids;
+    extract() returns them in the same order and at the same positions.
+    Written next to `path` and moved over it, a map loaded from `path` may
+    still have its grids mapped from the old file.
+    """
+    types, variants = tilemap.grid_types, tilemap.grid_variants
+    spawners = []
+    if not keep_spawners and SPAWNERS in tilemap.type_names:
+        mask = types == tilemap.type_names.index(SPAWNERS)
+        if mask.any():
+            ox, oy = tilemap.grid_origin
+            spawners = [(SPAWNERS, int(variants[gy, gx]), (int(gx) + ox) * tilemap.tile_size,
+                         (int(gy) + oy) * tilemap.tile_size) for gy, gx in zip(*np.nonzero(mask))]
+            types = np.where(mask, 0, types)
+            variants = np.where(mask, 0, variants)
+    tiles = [(tile['type'], tile['variant'], tile['pos'][0], tile['pos'][1]) for tile in tilemap.offgrid_tiles]
+    offgrid = np.zeros(len(tiles) + len(spawners), dtype=OFFGRID)
+    for i, (tile_type, variant, x, y) in enumerate(tiles + spawners):
+        offgrid[i] = (tilemap.type_id(tile_type), variant, x, y)
+    names = [name.encode() for name in tilemap.type_names[1:]]
+    rows, cols = types.shape
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, tilemap.tile_size, tilemap.grid_origin[0], tilemap.grid_origin[1],
+                            rows, cols, len(names), len(offgrid)))
+        for name in names:
+            f.write(bytes([len(name)]) + name)
+        for grid in (types, variants, tilemap.grid_flags):
+            f.write(np.ascontiguousarray(grid, dtype=np.uint8).tobytes())
+        f.write(offgrid.tobytes())
+    os.replace(path + '.tmp', path)
+
+
+def load(tilemap, path):
+    with open(path, 'rb') as f:
+        magic, version, tile_size, ox, oy, rows, cols, name_count, offgrid_count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} map')
+        names = [f.read(f.read(1)[0]).decode() for _ in range(name_count)]
+        offset = f.tell()
+
+    # copy-on-write maps: every process loading the level shares the same
+    # pages until one of them edits a cell
+    shape = (rows, cols)
+    size = rows * cols
+    types, variants, flags = (np.memmap(path, dtype=np.uint8, mode='c', offset=offset + i * size, shape=shape)
+                              for i in range(3))
+    ids = [tilemap.type_id(name) for name in names]
+    if ids != list(range(1, name_count + 1)):
+        types = np.array([0] + ids, dtype=np.uint8)[types]
+    offgrid = np.memmap(path, dtype=OFFGRID, mode='r', offset=offset + 3 * size,
+                        shape=(offgrid_count,)) if offgrid_count else []
+
+    tilemap.tile_size = tile_size
+    tilemap.grid_origin = (ox, oy)
+    tilemap.grid_types = types
+    tilemap.grid_variants = variants
+    tilemap.grid_flags = flags
+    # rebuilt from the grid on first use, most loads never need it
+    tilemap.tilemap = None
+    tilemap.offgrid_tiles = [{'type': names[tile['type'] - 1], 'variant': int(tile['variant']),
+                              'pos': [float(tile['x']), float(tile['y'])]} for tile in offgrid]
+    tilemap.chunks.clear()
+
+
+def convert(source, destination):
+    # either direction, the format is picked from the file extensions
+    from scripts.tilemap import Tilemap
+    tilemap = Tilemap(None)
+    tilemap.load(source)
+    tilemap.save(destination)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m scripts.mapfile SOURCE DESTINATION')
+    convert(sys.argv[1], sys.argv[2])
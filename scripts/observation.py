@@ -0,0 +1,117 @@
+import numpy as np
+import pygame
+from Constants import (OBSERVATION_WINDOW, DISPLAY_WIDTH, DISPLAY_HEIGHT,
+                       PIXEL_OBSERVATION_SIZE, PIXEL_OBSERVATION_STACK)
+
+# pos, velocity, dashing, dash_count, stamina, jumps, wall_slide, 4 collision sides
+KINEMATICS_SIZE = 13
+
+
+class ObservationEncoder:
+    """Flat observation vector read straight from the player and the tile grid.
+
+    The first KINEMATICS_SIZE values are the player state, the rest is the
+    window x window block of tile type ids centred on the player, row major,
+    0 for empty cells and anything outside the compiled grid. The vector is
+    float32, positions and negative velocities don't fit a byte; callers that
+    only want the tiles as uint8 use tile_window().
+    """
+    def __init__(self, tilemap, window=OBSERVATION_WINDOW):
+        self.tilemap = tilemap
+        self.window = window
+        self.size = KINEMATICS_SIZE + window * window
+
+    def empty(self):
+        return np.zeros(self.size, dtype=np.float32)
+
+    def encode(self, player, out=None):
+        if out is None:
+            out = self.empty()
+        collisions = player.collisions
+        out[:KINEMATICS_SIZE] = (player.pos[0], player.pos[1], player.velocity[0], player.velocity[1],
+                                 player.dashing, player.dash_count, player.stamina, player.jumps,
+                                 player.wall_slide, collisions['up'], collisions['down'],
+                                 collisions['left'], collisions['right'])
+        self.tile_window(player, out[KINEMATICS_SIZE:].reshape(self.window, self.window))
+        return out
+
+    def tile_window(self, player, out=None):
+        # same centre as player.rect(), without building the Rect
+        if out is None:
+            out = np.zeros((self.window, self.window), dtype=np.uint8)
+        tilemap = self.tilemap
+        grid = tilemap.grid_types
+        half = self.window // 2
+        tile_size = tilemap.tile_size
+        x0 = (int(player.pos[0]) + player.size[0] // 2) // tile_size - half - tilemap.grid_origin[0]
+        y0 = (int(player.pos[1]) + player.size[1] // 2) // tile_size - half - tilemap.grid_origin[1]
+        x1 = x0 + self.window
+        y1 = y0 + self.window
+        rows, cols = grid.shape
+        if x0 >= 0 and y0 >= 0 and x1 <= cols and y1 <= rows:
+            out[...] = grid[y0:y1, x0:x1]
+            return out
+        # partly or fully off the grid: copy the overlap, the rest stays empty
+        out[...] = 0
+        gx0, gy0 = max(x0, 0), max(y0, 0)
+        gx1, gy1 = min(x1, cols), min(y1, rows)
+        if gx0 < gx1 and gy0 < gy1:
+            out[gy0 - y0:gy1 - y0, gx0 - x0:gx1 - x0] = grid[gy0:gy1, gx0:gx1]
+        return out
+
+
+class PixelObservation:
+    """Downscaled frames of an Environment with game assets, last `stack` kept.
+
+    Renders into a private display surface, shrinks it into a reused small
+    surface and reads that through a surfarray view, so nothing is
+    allocated per frame. Frames are uint8, (stack, height, width) in
+    grayscale or (stack, height, width, 3) in RGB, oldest first.
+    """
+    # ITU-R 601 luma
+    LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    def __init__(self, environment, size=PIXEL_OBSERVATION_SIZE, grayscale=True,
+                 stack=PIXEL_OBSERVATION_STACK, scenery=False):
+        self.environment = environment
+        self.size = size
+        self.grayscale = grayscale
+        self.stack = stack
+        # background and clouds carry nothing an agent needs
+        self.scenery = scenery
+
+        self.display = pygame.Surface((DISPLAY_WIDTH, DISPLAY_HEIGHT))
+        self.small = pygame.Surface(size, 0, self.display)
+        width, height = size
+        shape = (stack, height, width) if grayscale else (stack, height, width, 3)
+        self.frames = np.zeros(shape, dtype=np.uint8)
+        self.luma = np.zeros((width, height), dtype=np.float32)
+        self.head = 0
+        # frame order oldest to newest for every head position
+        self.orders = [np.arange(head, head + stack) % stack for head in range(stack)]
+
+    def capture(self):
+        self.environment.render(self.display, scenery=self.scenery)
+        pygame.transform.smoothscale(self.display, self.size, self.small)
+        # surfarray views are (x, y), the stack is stored (y, x)
+        view = pygame.surfarray.pixels3d(self.small)
+        if self.grayscale:
+            np.dot(view, self.LUMA, out=self.luma)
+            self.frames[self.head] = self.luma.T
+        else:
+            self.frames[self.head] = view.transpose(1, 0, 2)
+        del view
+        self.head = (self.head + 1) % self.stack
+
+    def reset(self):
+        # a fresh episode starts with the first frame repeated
+        self.capture()
+        self.frames[:] = self.frames[self.head - 1]
+        return self.stacked()
+
+    def observe(self, out=None):
+        self.capture()
+        return self.stacked(out)
+
+    def stacked(self, out=None):
+        return np.take(self.frames, self.orders[self.head], axis=0, out=out)
@@ -1,25 +1,88 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
+import numpy as np
+from Constants import PARTICLE_POOL_SIZE
+
+
+class ParticlePool:
+    """Fixed-capacity particles kept in arrays instead of one object each.
+
+    Dead slots go back on a free list and are reused by the next spawn; when
+    the pool is full new particles are dropped.
+    """
+    def __init__(self, game, p_type='particle', capacity=PARTICLE_POOL_SIZE):
         self.game = game
         self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets['particle/' + p_type].copy()
-        self.animation.frame = frame
-    
+        self.capacity = capacity
+
+        animation = game.assets['particle/' + p_type]
+        self.img_duration = animation.img_duration
+        self.last_frame = animation.img_duration * len(animation.images) - 1
+        self.half_sizes = np.array([(img.get_width() // 2, img.get_height() // 2) for img in animation.images])
+
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.born = np.zeros(capacity, dtype=np.int64)
+        self.spawned = 0
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def spawn(self, pos, velocity=(0, 0), frame=0):
+        if not self.free:
+            return
+        i = self.free.pop()
+        self.pos[i] = pos
+        self.velocity[i] = velocity
+        self.frame[i] = frame
+        self.alive[i] = True
+        self.born[i] = self.spawned
+        self.spawned += 1
+
+    def clear(self):
+        self.alive[:] = False
+        self.free = list(range(self.capacity - 1, -1, -1))
+
+    def state_size(self):
+        # arrays, spawned counter, free list padded to capacity
+        return self.capacity * (2 * 8 + 2 * 8 + 8 + 1 + 8 + 4) + 8
+
+    def get_state(self):
+        free = np.full(self.capacity, -1, dtype=np.int32)
+        free[:len(self.free)] = self.free
+        return b''.join((self.pos.tobytes(), self.velocity.tobytes(), self.frame.tobytes(),
+                         self.alive.tobytes(), self.born.tobytes(), self.spawned.to_bytes(8, 'little'),
+                         free.tobytes()))
+
+    def set_state(self, blob):
+        offset = 0
+        for array in (self.pos, self.velocity, self.frame, self.alive, self.born):
+            array[...] = np.frombuffer(blob, dtype=array.dtype, count=array.size, offset=offset).reshape(array.shape)
+            offset += array.nbytes
+        self.spawned = int.from_bytes(blob[offset:offset + 8], 'little')
+        free = np.frombuffer(blob, dtype=np.int32, count=self.capacity, offset=offset + 8)
+        self.free = free[:self.capacity - int(self.alive.sum())].tolist()
+
     def update(self):
-        kill = False
-        if self.animation.done:
-            kill = True
-        
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
-        
-        self.animation.update()
-        
-        return kill
-    
+        # same order as Animation: a particle whose animation finished last
+        # update still moves once more, then it is removed
+        kill = self.alive & (self.frame >= self.last_frame)
+        self.pos += self.velocity
+        np.minimum(self.frame + 1, self.last_frame, out=self.frame)
+        if kill.any():
+            self.alive[kill] = False
+            self.free.extend(np.flatnonzero(kill)[::-1].tolist())
+
     def render(self, surf, offset=(0, 0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
-    
\ No newline at end of file
+        alive = np.flatnonzero(self.alive)
+        if not len(alive):
+            return
+        # oldest first, recycled slots would otherwise change the overlap order
+        alive = alive[np.argsort(self.born[alive])]
+        atlas = self.game.atlas
+        key = 'particle/' + self.type
+        index = self.frame[alive] // self.img_duration
+        dest = self.pos[alive] - offset - self.half_sizes[index] - 1
+        surf.blits([(atlas.surface, pos, atlas.regions[(key, i, False)])
+                    for pos, i in zip(dest.tolist(), index.tolist())], doreturn=False)
@@ -0,0 +1,90 @@
+import os
+import struct
+import zlib
+
+from Constants import DEFAULT_MAP_PATH
+
+# magic, version, seed, level id, map path length, frame count, final state checksum
+HEADER = struct.Struct('<4sBQHHII')
+# version 1 had no level id, its replays are all level 0
+HEADER_V1 = struct.Struct('<4sBQHII')
+MAGIC = b'PMRP'
+VERSION = 2
+
+
+def state_checksum(environment):
+    # crc of the player kinematics, enough to tell two simulations apart
+    player = environment.player
+    return zlib.crc32(struct.pack('<4d', player.pos[0], player.pos[1], player.velocity[0], player.velocity[1]))
+
+
+class Replay:
+    """Seed plus one byte per frame: action in the low nibble, state above it.
+
+    Feeding the frames back through Environment.move/update with the same
+    seed, map and level reproduces the run exactly, headless or not.
+    """
+    def __init__(self, seed, map_path=DEFAULT_MAP_PATH, level_id=0):
+        self.seed = seed
+        self.map_path = map_path
+        self.level_id = level_id
+        self.frames = bytearray()
+        self.checksum = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def record(self, action, state):
+        self.frames.append((action or 0) | (state or 0) << 4)
+
+    def inputs(self):
+        for byte in self.frames:
+            yield byte & 0x0F, byte >> 4
+
+    def save(self, path, environment=None):
+        if environment is not None:
+            self.checksum = state_checksum(environment)
+        map_path = self.map_path.encode()
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.level_id, len(map_path), len(self.frames), self.checksum))
+            f.write(map_path)
+            f.write(self.frames)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version = data[:4], data[4]
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError(f'{path} is not a version {VERSION} replay')
+        if version == 1:
+            magic, version, seed, path_length, frame_count, checksum = HEADER_V1.unpack_from(data)
+            level_id, offset = 0, HEADER_V1.size
+        else:
+            magic, version, seed, level_id, path_length, frame_count, checksum = HEADER.unpack_from(data)
+            offset = HEADER.size
+        replay = cls(seed, data[offset:offset + path_length].decode(), level_id)
+        offset += path_length
+        replay.frames = bytearray(data[offset:offset + frame_count])
+        replay.checksum = checksum
+        return replay
+
+    def play(self, environment=None):
+        # re-simulates the run as fast as possible, headless by default;
+        # levels of a pool need the environment holding the pool passed in
+        if environment is None:
+            if self.level_id or not os.path.exists(self.map_path):
+                raise ValueError(f'level {self.level_id} ({self.map_path}) is not a map file, '
+                                 'pass the environment holding its level pool')
+            from environment import Environment
+            environment = Environment(seed=self.seed, map_path=self.map_path)
+        # a fresh episode of the recorded level, whatever the environment did before
+        environment.reset(seed=self.seed, level_id=self.level_id)
+        for action, state in self.inputs():
+            environment.move(action, state)
+            environment.update()
+        return environment
+
+    def verify(self, environment=None):
+        environment = self.play(environment)
+        return not self.checksum or state_checksum(environment) == self.checksum
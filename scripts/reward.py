@@ -0,0 +1,84 @@
+from collections import deque
+
+import numpy as np
+from Constants import (TILE_FLAG_SOLID, TILE_FLAG_SPIKE, REWARD_FINISH, REWARD_DEATH,
+                       REWARD_PROGRESS, REWARD_TIME, REWARD_DASH)
+
+UNREACHABLE = -1
+
+
+def distance_field(tilemap, targets=('finish',)):
+    """Path distance in tiles from every grid cell to the nearest target cell.
+
+    Breadth-first over the 4-neighbourhood, through any cell that is neither
+    solid nor spikes. Cells that cannot reach a target are UNREACHABLE.
+    """
+    ids = [tilemap.type_ids[name] for name in targets if name in tilemap.type_ids]
+    distances = np.full(tilemap.grid_types.shape, UNREACHABLE, dtype=np.int32)
+    blocked = (tilemap.grid_flags & (TILE_FLAG_SOLID | TILE_FLAG_SPIKE)) != 0
+    rows, cols = distances.shape
+
+    queue = deque()
+    for gy, gx in zip(*np.nonzero(np.isin(tilemap.grid_types, ids))):
+        distances[gy, gx] = 0
+        queue.append((int(gy), int(gx)))
+    while queue:
+        gy, gx = queue.popleft()
+        step = distances.item(gy, gx) + 1
+        for ny, nx in ((gy - 1, gx), (gy + 1, gx), (gy, gx - 1), (gy, gx + 1)):
+            if 0 <= ny < rows and 0 <= nx < cols and distances.item(ny, nx) == UNREACHABLE and not blocked.item(ny, nx):
+                distances[ny, nx] = step
+                queue.append((ny, nx))
+    return distances
+
+
+class RewardShaper:
+    """Per-step reward for Environment.step.
+
+    Finish and death are the sparse terms; progress pays for every tile of
+    path distance to the target gained since the last step, looked up in a
+    distance field computed once from the loaded map. Time is charged per
+    frame and dash per dash used.
+    """
+    def __init__(self, tilemap, targets=('finish',), finish=REWARD_FINISH, death=REWARD_DEATH,
+                 progress=REWARD_PROGRESS, time=REWARD_TIME, dash=REWARD_DASH):
+        self.tilemap = tilemap
+        self.finish = finish
+        self.death = death
+        self.progress = progress
+        self.time = time
+        self.dash = dash
+        self.distances = distance_field(tilemap, targets) if progress else None
+        self.last_distance = None
+
+    def distance(self, player):
+        # distance from the cell under the player's centre, None off the map
+        if self.distances is None:
+            return None
+        tilemap = self.tilemap
+        ts = tilemap.tile_size
+        gx = (int(player.pos[0]) + player.size[0] // 2) // ts - tilemap.grid_origin[0]
+        gy = (int(player.pos[1]) + player.size[1] // 2) // ts - tilemap.grid_origin[1]
+        rows, cols = self.distances.shape
+        if 0 <= gx < cols and 0 <= gy < rows:
+            distance = self.distances.item(gy, gx)
+            if distance != UNREACHABLE:
+                return distance
+        return None
+
+    def reset(self, player):
+        self.last_distance = self.distance(player)
+
+    def reward(self, player, frames=1, died=False, finished=False, dashes=0):
+        reward = self.time * frames + self.dash * dashes
+        if died:
+            reward += self.death
+        if finished:
+            reward += self.finish
+        if self.progress:
+            distance = self.distance(player)
+            if distance is not None:
+                if self.last_distance is not None:
+                    reward += self.progress * (self.last_distance - distance)
+                self.last_distance = distance
+        return reward
@@ -1,16 +1,54 @@
 import json
 
+import numpy as np
 import pygame
-from Constants import AUTOTILE_TYPES, AUTOTILE_MAP, NEIGHBOR_OFFSETS, PHYSICS_TILES
+from scripts import mapfile
+from scripts.assets import assets
+from Constants import AUTOTILE_TYPES, AUTOTILE_MAP, NEIGHBOR_OFFSETS, PHYSICS_TILES, TILE_TYPES, TILE_FLAG_SOLID, TILE_FLAG_SPIKE, TILE_FLAG_FINISH, CHUNK_SIZE
+
+GRID_MARGIN = 8
+
+# autotile neighbours as bits, and AUTOTILE_MAP as a table indexed by the bitmask
+AUTOTILE_SHIFTS = [(1, 0), (-1, 0), (0, -1), (0, 1)]
+AUTOTILE_LUT = [AUTOTILE_MAP.get(tuple(sorted(shift for i, shift in enumerate(AUTOTILE_SHIFTS) if mask >> i & 1)), -1)
+                for mask in range(1 << len(AUTOTILE_SHIFTS))]
+
+
+def tile_flags(tile_type):
+    flags = 0
+    if tile_type in PHYSICS_TILES:
+        flags |= TILE_FLAG_SOLID
+    if tile_type == 'spikes':
+        flags |= TILE_FLAG_SPIKE
+    if tile_type == 'finish':
+        flags |= TILE_FLAG_FINISH
+    return flags
 
 
 class Tilemap:
     def __init__(self, game, tile_size=16):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}
+        self._tilemap = {}
         self.offgrid_tiles = []
-        
+
+        # compiled layer, the dict above stays the editing/save format
+        self.type_names = [None] + TILE_TYPES
+        self.type_ids = {name: i for i, name in enumerate(self.type_names) if name}
+
+        # render caches: baked chunk surfaces and a bucket index of offgrid tiles
+        self.chunks = {}
+        self.chunk_overhang = 0
+        self.offgrid_index = {}
+        self.offgrid_reach = 0
+        # tile types whose images the two numbers above already cover
+        self.measured = set()
+        # checkpoint cell -> respawn position in pixels, rebuilt by load
+        self.checkpoints = {}
+        # cells edited since the last autotile_dirty()
+        self.dirty = set()
+        self.compile()
+
     def extract(self, id_pairs, keep=False):
         matches = []
         for tile in self.offgrid_tiles.copy():
@@ -18,118 +56,430 @@ class Tilemap:
                 matches.append(tile.copy())
                 if not keep:
                     self.offgrid_tiles.remove(tile)
-        
-        # Convert dict keys to a list before iteration to avoid RuntimeError
-        tilemap_keys = list(self.tilemap.keys())
-        for loc in tilemap_keys:
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                match = tile.copy()
-                match['pos'] = match['pos'].copy()
-                match['pos'][0] *= self.tile_size
-                match['pos'][1] *= self.tile_size
-                matches.append(match)
-                if not keep:
-                    del self.tilemap[loc]
-        
+        self.index_offgrid()
+
+        # straight from the compiled grid, row by row
+        mask = np.zeros(self.grid_types.shape, dtype=bool)
+        for tile_type, variant in id_pairs:
+            if tile_type in self.type_ids:
+                mask |= (self.grid_types == self.type_ids[tile_type]) & (self.grid_variants == variant)
+        ox, oy = self.grid_origin
+        for gy, gx in zip(*np.nonzero(mask)):
+            pos = [int(gx) + ox, int(gy) + oy]
+            match = self.tile_at(pos[0], pos[1])
+            match['pos'] = [pos[0] * self.tile_size, pos[1] * self.tile_size]
+            matches.append(match)
+            if not keep:
+                self.remove_tile(pos)
+
         return matches
-    
+
+    @property
+    def tilemap(self):
+        # the editing/save format; maps loaded from a binary file only have
+        # the grid until something asks for it
+        if self._tilemap is None:
+            self._tilemap = self._tiles_from_grid()
+        return self._tilemap
+
+    @tilemap.setter
+    def tilemap(self, tiles):
+        self._tilemap = tiles
+
+    def _tiles_from_grid(self):
+        tiles = {}
+        ox, oy = self.grid_origin
+        for gy, gx in zip(*np.nonzero(self.grid_types)):
+            tile = self.tile_at(int(gx) + ox, int(gy) + oy)
+            tiles[str(tile['pos'][0]) + ';' + str(tile['pos'][1])] = tile
+        return tiles
+
+    def type_id(self, tile_type):
+        if tile_type not in self.type_ids:
+            self.type_ids[tile_type] = len(self.type_names)
+            self.type_names.append(tile_type)
+        return self.type_ids[tile_type]
+
+    def compile(self):
+        tiles = self.tilemap.values()
+        xs = [tile['pos'][0] for tile in tiles] or [0]
+        ys = [tile['pos'][1] for tile in tiles] or [0]
+        self.grid_origin = (min(xs) - GRID_MARGIN, min(ys) - GRID_MARGIN)
+        shape = (max(ys) - min(ys) + 1 + GRID_MARGIN * 2, max(xs) - min(xs) + 1 + GRID_MARGIN * 2)
+        self.grid_types = np.zeros(shape, dtype=np.uint8)
+        self.grid_variants = np.zeros(shape, dtype=np.uint8)
+        self.grid_flags = np.zeros(shape, dtype=np.uint8)
+        for tile in tiles:
+            self._write_cell(tile['pos'][0], tile['pos'][1], tile)
+        self.chunks.clear()
+
+    def _write_cell(self, x, y, tile):
+        gx = x - self.grid_origin[0]
+        gy = y - self.grid_origin[1]
+        if tile is not None and self.offgrid_reach and tile['type'] not in self.measured:
+            self._measure([tile['type']])
+        # the chunk holding the cell, plus the ones an oversized image spills into
+        for dx in {0, self.chunk_overhang}:
+            for dy in {0, self.chunk_overhang}:
+                self.chunks.pop(((x + dx) // CHUNK_SIZE, (y + dy) // CHUNK_SIZE), None)
+        if tile is None:
+            self.grid_types[gy, gx] = 0
+            self.grid_variants[gy, gx] = 0
+            self.grid_flags[gy, gx] = 0
+        else:
+            self.grid_types[gy, gx] = self.type_id(tile['type'])
+            self.grid_variants[gy, gx] = tile['variant']
+            self.grid_flags[gy, gx] = tile_flags(tile['type'])
+
+    def in_grid(self, x, y):
+        gx = x - self.grid_origin[0]
+        gy = y - self.grid_origin[1]
+        return 0 <= gx < self.grid_flags.shape[1] and 0 <= gy < self.grid_flags.shape[0]
+
+    def flags_at(self, x, y):
+        gx = x - self.grid_origin[0]
+        gy = y - self.grid_origin[1]
+        if 0 <= gx < self.grid_flags.shape[1] and 0 <= gy < self.grid_flags.shape[0]:
+            return self.grid_flags.item(gy, gx)
+        return 0
+
+    def tile_at(self, x, y):
+        if not self.in_grid(x, y):
+            return None
+        gx = x - self.grid_origin[0]
+        gy = y - self.grid_origin[1]
+        type_id = self.grid_types.item(gy, gx)
+        if type_id:
+            return {'type': self.type_names[type_id], 'variant': self.grid_variants.item(gy, gx), 'pos': [x, y]}
+        return None
+
+    def set_tile(self, pos, tile_type, variant):
+        x, y = int(pos[0]), int(pos[1])
+        tile = {'type': tile_type, 'variant': variant, 'pos': [x, y]}
+        if self._tilemap is not None or not self.in_grid(x, y):
+            self.tilemap[str(x) + ';' + str(y)] = tile
+        if self.in_grid(x, y):
+            self._write_cell(x, y, tile)
+        else:
+            self.compile()
+        self.dirty.add((x, y))
+
+    def remove_tile(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if self._tilemap is None:
+            tile = self.tile_at(x, y)
+        else:
+            tile = self._tilemap.pop(str(x) + ';' + str(y), None)
+        if tile is not None and self.in_grid(x, y):
+            self._write_cell(x, y, None)
+            self.dirty.add((x, y))
+        return tile
+
     def tiles_around(self, pos):
         tiles = []
         tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
         for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
+            tile = self.tile_at(tile_loc[0] + offset[0], tile_loc[1] + offset[1])
+            if tile:
+                tiles.append(tile)
         return tiles
-    
+
     def save(self, path):
+        if path.endswith(mapfile.EXTENSION):
+            mapfile.save(self, path)
+            return
         f = open(path, 'w')
         json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
         f.close()
-        
+
     def load(self, path):
-        f = open(path, 'r')
-        map_data = json.load(f)
-        f.close()
-        
+        if path.endswith(mapfile.EXTENSION):
+            mapfile.load(self, path)
+            self.index_offgrid()
+            self.index_checkpoints()
+            if self.offgrid_reach:
+                self._measure(self.present_types())
+        else:
+            f = open(path, 'r')
+            map_data = json.load(f)
+            f.close()
+            self.load_data(map_data)
+
+    def load_data(self, map_data):
+        # a map in the JSON layout, from a file or straight from a generator
         self.tilemap = map_data['tilemap']
         self.tile_size = map_data['tile_size']
         self.offgrid_tiles = map_data['offgrid']
-        
+        self.compile()
+        self.index_offgrid()
+        self.index_checkpoints()
+        if self.offgrid_reach:
+            self._measure(self.present_types())
+
+    def add_offgrid(self, tile):
+        # appended last, so its bucket stays in list order without a rebuild
+        if self.offgrid_reach and tile['type'] not in self.measured:
+            self._measure([tile['type']])
+        self.offgrid_tiles.append(tile)
+        bucket = self.tile_size * CHUNK_SIZE
+        key = (int(tile['pos'][0] // bucket), int(tile['pos'][1] // bucket))
+        self.offgrid_index.setdefault(key, []).append(len(self.offgrid_tiles) - 1)
+
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+        self.index_offgrid()
+
+    def index_offgrid(self):
+        # uniform grid of chunk sized buckets, keyed by the tile's top-left
+        self.offgrid_index = {}
+        bucket = self.tile_size * CHUNK_SIZE
+        for i, tile in enumerate(self.offgrid_tiles):
+            key = (int(tile['pos'][0] // bucket), int(tile['pos'][1] // bucket))
+            self.offgrid_index.setdefault(key, []).append(i)
+
+    def offgrid_in(self, rect):
+        # tiles anchored up to offgrid_reach pixels above/left can still overlap
+        bucket = self.tile_size * CHUNK_SIZE
+        found = []
+        for bx in range(int((rect[0] - self.offgrid_reach) // bucket), int((rect[0] + rect[2]) // bucket) + 1):
+            for by in range(int((rect[1] - self.offgrid_reach) // bucket), int((rect[1] + rect[3]) // bucket) + 1):
+                found.extend(self.offgrid_index.get((bx, by), ()))
+        found.sort()
+        return [self.offgrid_tiles[i] for i in found]
+
+    def index_checkpoints(self):
+        # grid and offgrid checkpoints alike, keyed by the cell they sit in
+        ts = self.tile_size
+        self.checkpoints = {}
+        ox, oy = self.grid_origin
+        for gy, gx in zip(*np.nonzero(self.grid_types == self.type_ids['checkpoint'])):
+            x, y = int(gx) + ox, int(gy) + oy
+            self.checkpoints[(x, y)] = [x * ts, y * ts]
+        for tile in self.offgrid_tiles:
+            if tile['type'] == 'checkpoint':
+                self.checkpoints[(int(tile['pos'][0] // ts), int(tile['pos'][1] // ts))] = list(tile['pos'])
+
+    def checkpoint_check(self, entity_rect):
+        # the first checkpoint cell the rect overlaps, None if there is none
+        if not self.checkpoints:
+            return None
+        left, top, width, height = entity_rect
+        ts = self.tile_size
+        for x in range(left // ts, (left + width - 1) // ts + 1):
+            for y in range(top // ts, (top + height - 1) // ts + 1):
+                if (x, y) in self.checkpoints:
+                    return (x, y)
+        return None
+
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
-    
-    def spike_check(self, entity_rect):
-        tile_x1 = int(entity_rect.left // self.tile_size)
-        tile_y1 = int(entity_rect.top // self.tile_size)
-        tile_x2 = int(entity_rect.right // self.tile_size)
-        tile_y2 = int(entity_rect.bottom // self.tile_size)
-        
-        for x in range(tile_x1, tile_x2 + 1):
-            for y in range(tile_y1, tile_y2 + 1):
-                tile_loc = f"{x};{y}"
-                if tile_loc in self.tilemap:
-                    if self.tilemap[tile_loc]['type'] == 'spikes':
-                        spike_rect = pygame.Rect(
-                            self.tilemap[tile_loc]['pos'][0] * self.tile_size,
-                            self.tilemap[tile_loc]['pos'][1] * self.tile_size,
-                            self.tile_size, self.tile_size
-                        )
-                        if entity_rect.colliderect(spike_rect):
-                            return True
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        if self.flags_at(tile_x, tile_y) & TILE_FLAG_SOLID:
+            return self.tile_at(tile_x, tile_y)
+
+    def flag_check(self, entity_rect, flag):
+        # only the cells the rect really overlaps, so no Rect test is needed
+        left, top, width, height = entity_rect
+        ts = self.tile_size
+        flags = self.grid_flags
+        rows, cols = flags.shape
+        ox, oy = self.grid_origin
+        for gx in range(max(left // ts - ox, 0), min((left + width - 1) // ts - ox + 1, cols)):
+            for gy in range(max(top // ts - oy, 0), min((top + height - 1) // ts - oy + 1, rows)):
+                if flags.item(gy, gx) & flag:
+                    return True
         return False
-    
+
+    def spike_check(self, entity_rect):
+        return self.flag_check(entity_rect, TILE_FLAG_SPIKE)
+
     def finishline_check(self, entity_rect):
-        tile_x1 = int(entity_rect.left // self.tile_size)
-        tile_y1 = int(entity_rect.top // self.tile_size)
-        tile_x2 = int(entity_rect.right // self.tile_size)
-        tile_y2 = int(entity_rect.bottom // self.tile_size)
-        
-        for x in range(tile_x1, tile_x2 + 1):
-            for y in range(tile_y1, tile_y2 + 1):
-                tile_loc = f"{x};{y}"
-                if tile_loc in self.tilemap:
-                    if self.tilemap[tile_loc]['type'] == 'finish':
-                        finish_rect = pygame.Rect(
-                            self.tilemap[tile_loc]['pos'][0] * self.tile_size,
-                            self.tilemap[tile_loc]['pos'][1] * self.tile_size,
-                            self.tile_size, self.tile_size
-                        )
-                        if entity_rect.colliderect(finish_rect):
-                            return True
-        return False
-    
+        return self.flag_check(entity_rect, TILE_FLAG_FINISH)
+
     def physics_rects_around(self, pos):
         rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
+        ts = self.tile_size
+        flags = self.grid_flags
+        rows, cols = flags.shape
+        ox, oy = self.grid_origin
+        tile_x = int(pos[0] // ts)
+        tile_y = int(pos[1] // ts)
+        for offset in NEIGHBOR_OFFSETS:
+            x, y = tile_x + offset[0], tile_y + offset[1]
+            if 0 <= x - ox < cols and 0 <= y - oy < rows and flags.item(y - oy, x - ox) & TILE_FLAG_SOLID:
+                rects.append(pygame.Rect(x * ts, y * ts, ts, ts))
         return rects
-    
+
+    def sweep(self, pos, size, axis, movement):
+        # moves the int rect at pos along one axis and stops it at the first
+        # solid cell it would enter, however far it travels this frame.
+        # returns the new coordinate and 1 / -1 for a hit in that direction
+        ts = self.tile_size
+        flags = self.grid_flags
+        rows, cols = flags.shape
+        ox, oy = self.grid_origin
+        start = int(pos[axis])
+        end = int(pos[axis] + movement)
+        other = int(pos[1 - axis])
+        if movement > 0:
+            cells = range(-(-(start + size[axis]) // ts), (end + size[axis] - 1) // ts + 1)
+        elif movement < 0:
+            cells = range(start // ts - 1, end // ts - 1, -1)
+        else:
+            return pos[axis], 0
+        across = range(other // ts, (other + size[1 - axis] - 1) // ts + 1)
+
+        for cell in cells:
+            for cross in across:
+                x, y = (cell, cross) if axis == 0 else (cross, cell)
+                if 0 <= x - ox < cols and 0 <= y - oy < rows and flags.item(y - oy, x - ox) & TILE_FLAG_SOLID:
+                    if movement > 0:
+                        return cell * ts - size[axis], 1
+                    return (cell + 1) * ts, -1
+        return pos[axis] + movement, 0
+
     def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
+        # every cell at once: neighbour bits from shifted copies of the grid,
+        # returns the (x, y, old variant) of every cell it changed
+        types = self.grid_types
+        rows, cols = types.shape
+        padded = np.zeros((rows + 2, cols + 2), dtype=types.dtype)
+        padded[1:-1, 1:-1] = types
+        masks = np.zeros(types.shape, dtype=np.uint8)
+        for bit, (dx, dy) in enumerate(AUTOTILE_SHIFTS):
+            masks |= (padded[1 + dy:rows + 1 + dy, 1 + dx:cols + 1 + dx] == types).astype(np.uint8) << bit
+        variants = np.array(AUTOTILE_LUT, dtype=np.int16)[masks]
+        limits = np.array(self.autotile_limits(), dtype=np.int16)
+        autotiled = (variants >= 0) & (variants < limits[types])
+        changed = []
+        for gy, gx in zip(*np.nonzero(autotiled & (self.grid_variants != variants))):
+            x, y = int(gx) + self.grid_origin[0], int(gy) + self.grid_origin[1]
+            changed.append((x, y, self.grid_variants.item(gy, gx)))
+            self._set_variant(x, y, int(variants[gy, gx]))
+        self.dirty.clear()
+        return changed
+
+    def autotile_dirty(self):
+        # only the cells edited since the last call and their 4 neighbours
+        cells = set()
+        for x, y in self.dirty:
+            cells.add((x, y))
+            for dx, dy in AUTOTILE_SHIFTS:
+                cells.add((x + dx, y + dy))
+        self.dirty.clear()
+        if not cells:
+            return []
+        limits = self.autotile_limits()
+        types = self.grid_types
+        ox, oy = self.grid_origin
+        changed = []
+        for x, y in cells:
+            if not self.in_grid(x, y):
+                continue
+            type_id = types.item(y - oy, x - ox)
+            if not limits[type_id]:
+                continue
+            mask = 0
+            for bit, (dx, dy) in enumerate(AUTOTILE_SHIFTS):
+                if self.in_grid(x + dx, y + dy) and types.item(y + dy - oy, x + dx - ox) == type_id:
+                    mask |= 1 << bit
+            variant = AUTOTILE_LUT[mask]
+            if 0 <= variant < limits[type_id] and variant != self.grid_variants.item(y - oy, x - ox):
+                changed.append((x, y, self.grid_variants.item(y - oy, x - ox)))
+                self._set_variant(x, y, variant)
+        return changed
+
+    def autotile_limits(self):
+        # per type id, how many variants autotiling may pick from: 0 for types
+        # it leaves alone, and types with fewer images than AUTOTILE_MAP uses
+        # (spikes has one) only get the variants they have
+        source = self.game.assets if self.game is not None else assets
+        return [source.count(name) if name in AUTOTILE_TYPES and name in source else 0
+                for name in self.type_names]
+
+    def _set_variant(self, x, y, variant):
+        if self._tilemap is not None:
+            self._tilemap[str(x) + ';' + str(y)]['variant'] = variant
+        self._write_cell(x, y, self.tile_at(x, y) | {'variant': variant})
+
+    def present_types(self):
+        types = {self.type_names[type_id] for type_id in np.unique(self.grid_types).tolist() if type_id}
+        types.update(tile['type'] for tile in self.offgrid_tiles)
+        return types
+
+    def _measure(self, tile_types):
+        # widen the overhang and offgrid reach for types not measured yet;
+        # only their images get loaded, not every type's
+        assets = self.game.assets
+        sizes = [max(img.get_size()) for tile_type in set(tile_types) - self.measured
+                 if tile_type in assets for img in assets[tile_type]]
+        self.measured.update(tile_types)
+        reach = max(sizes + [self.offgrid_reach])
+        overhang = max(-(-reach // self.tile_size) - 1, 0)
+        if overhang != self.chunk_overhang:
+            # baked chunks don't have the wider spill yet
+            self.chunks.clear()
+        self.chunk_overhang = overhang
+        self.offgrid_reach = reach
+
+    def bake_chunks(self):
+        self.measured = set()
+        self.offgrid_reach = 0
+        self._measure(self.present_types())
+        if not self.offgrid_reach:
+            # nothing to draw yet, and render() bakes while this is 0
+            self.offgrid_reach = self.tile_size
+
+        self.chunks.clear()
+        x0 = self.grid_origin[0] // CHUNK_SIZE
+        y0 = self.grid_origin[1] // CHUNK_SIZE
+        x1 = (self.grid_origin[0] + self.grid_types.shape[1] + self.chunk_overhang) // CHUNK_SIZE
+        y1 = (self.grid_origin[1] + self.grid_types.shape[0] + self.chunk_overhang) // CHUNK_SIZE
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.chunks[(cx, cy)] = self._bake_chunk(cx, cy)
+
+    def _bake_chunk(self, cx, cy):
+        size = CHUNK_SIZE * self.tile_size
+        x0 = cx * CHUNK_SIZE - self.chunk_overhang - self.grid_origin[0]
+        y0 = cy * CHUNK_SIZE - self.chunk_overhang - self.grid_origin[1]
+        x1 = (cx + 1) * CHUNK_SIZE - self.grid_origin[0]
+        y1 = (cy + 1) * CHUNK_SIZE - self.grid_origin[1]
+        types = self.grid_types[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)]
+        if not types.any():
+            return None
+        variants = self.grid_variants[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)]
+
+        chunk = pygame.Surface((size, size))
+        chunk.set_colorkey((0, 0, 0))
+        left = (max(x0, 0) + self.grid_origin[0]) * self.tile_size - cx * size
+        top = (max(y0, 0) + self.grid_origin[1]) * self.tile_size - cy * size
+        # column by column, the same draw order the per-tile renderer had
+        gxs, gys = np.nonzero(types.T)
+        assets = self.game.assets
+        for gx, gy in zip(gxs.tolist(), gys.tolist()):
+            tile_type = self.type_names[types[gy, gx]]
+            # finish cells and other markers have no image
+            if tile_type not in assets:
+                continue
+            img = assets[tile_type][variants[gy, gx]]
+            chunk.blit(img, (left + gx * self.tile_size, top + gy * self.tile_size))
+        return chunk
 
     def render(self, surf, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
+        # baked on the first frame rather than in load(), callers still
+        # extract() spawners and other non-rendered tiles after loading
+        if not self.offgrid_reach:
+            self.bake_chunks()
+        view = (offset[0], offset[1], surf.get_width(), surf.get_height())
+        for tile in self.offgrid_in(view):
             surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-            
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] * self.tile_size - offset[0], tile['pos'][1] * self.tile_size - offset[1]))
\ No newline at end of file
+
+        size = CHUNK_SIZE * self.tile_size
+        for cx in range(offset[0] // size, (offset[0] + view[2]) // size + 1):
+            for cy in range(offset[1] // size, (offset[1] + view[3]) // size + 1):
+                if (cx, cy) not in self.chunks:
+                    self.chunks[(cx, cy)] = self._bake_chunk(cx, cy)
+                chunk = self.chunks[(cx, cy)]
+                if chunk:
+                    surf.blit(chunk, (cx * size - offset[0], cy * size - offset[1]))
@@ -37,8 +37,11 @@ class Animation:
             if self.frame >= self.img_duration * len(self.images) - 1:
                 self.done = True
     
+    def index(self):
+        return int(self.frame / self.img_duration)
+    
     def img(self):
-        return self.images[int(self.frame / self.img_duration)]
+        return self.images[self.index()]
     
 
 class Text():
@@ -59,7 +62,11 @@ class Button():
         self.font = font
         self.base_color, self.hovering_color = base_color, hovering_color
         self.text_input = text_input
-        self.text = self.font.render(self.text_input, True, self.base_color)
+        # rendered once per hover state, changeColor only swaps them
+        self.texts = {False: self.font.render(self.text_input, True, self.base_color),
+                      True: self.font.render(self.text_input, True, self.hovering_color)}
+        self.hovered = False
+        self.text = self.texts[False]
         
         if self.image is None:
             # Create a default surface if no image is provided
@@ -75,12 +82,12 @@ class Button():
         screen.blit(self.text, self.text_rect)
 
     def checkForInput(self, position):
-        if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-            return True
-        return False
+        return bool(self.rect.collidepoint(position))
 
     def changeColor(self, position):
-        if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top, self.rect.bottom):
-            self.text = self.font.render(self.text_input, True, self.hovering_color)
-        else:
-            self.text = self.font.render(self.text_input, True, self.base_color)
\ No newline at end of file
+        # True when the hover state flipped and the button needs a redraw
+        hovered = self.checkForInput(position)
+        changed = hovered != self.hovered
+        self.hovered = hovered
+        self.text = self.texts[hovered]
+        return changed
\ No newline at end of file
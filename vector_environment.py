@@ -0,0 +1,304 @@
+import numpy as np
+from Constants import *
+from scripts.tilemap import Tilemap
+
+LEFT_ACTIONS = (3, 5, 7)
+RIGHT_ACTIONS = (4, 6, 8)
+UP_ACTIONS = (1, 5, 6)
+DOWN_ACTIONS = (2, 7, 8)
+# the same sets as direction lookup tables indexed by action
+ACTION_X = np.array([-1 if a in LEFT_ACTIONS else 1 if a in RIGHT_ACTIONS else 0 for a in range(9)])
+ACTION_Y = np.array([-1 if a in UP_ACTIONS else 1 if a in DOWN_ACTIONS else 0 for a in range(9)])
+
+# per-player columns, everything gather() has to carry along
+STATE_COLUMNS = ('pos', 'velocity', 'flip', 'air_time', 'jumps', 'wall_slide', 'dashing', 'dash_count',
+                 'dash_direction', 'jump_held', 'jump_timer', 'jump_strength_multiplier', 'stamina',
+                 'wall_jump_count', 'moving_left', 'moving_right', 'is_jumping')
+
+
+class VectorEnvironment:
+    """N headless players stepped together over one shared tilemap.
+
+    The player state is kept as structure-of-arrays columns and every step
+    reproduces Player.update / jump / dash / _update_dash for all players at
+    once, with the same swept collision as Tilemap.sweep. Players that die or reach the finish are reset in place.
+    """
+    def __init__(self, num_envs, map_path=DEFAULT_MAP_PATH, tilemap=None, default_pos=None):
+        self.num_envs = num_envs
+        self.size = PLAYER_SIZE
+
+        # an already loaded tilemap, e.g. a generated level, instead of map_path;
+        # it belongs to the caller, so its spawners are only read, and a
+        # pool Level's tilemap has none left: pass its default_pos
+        if tilemap is None:
+            tilemap = Tilemap(None, tile_size=TILE_SIZE)
+            tilemap.load(map_path)
+            keep = False
+        else:
+            keep = True
+        self.tilemap = tilemap
+        if default_pos is None:
+            spawners = self.tilemap.extract([('spawners', 0), ('spawners', 1)], keep=keep)
+            default_pos = spawners[0]['pos'] if spawners else [10, 10]
+        self.default_pos = list(default_pos)
+        # the map never changes here, so split the flag grid into bool masks once
+        self.flag_masks = {flag: (self.tilemap.grid_flags & flag) != 0 for flag in (TILE_FLAG_SOLID, TILE_FLAG_SPIKE, TILE_FLAG_FINISH)}
+
+        n = num_envs
+        self.pos = np.zeros((n, 2))
+        self.velocity = np.zeros((n, 2))
+        self.collisions = {side: np.zeros(n, dtype=bool) for side in ('up', 'down', 'right', 'left')}
+        self.flip = np.zeros(n, dtype=bool)
+        self.air_time = np.zeros(n, dtype=np.int64)
+        self.jumps = np.zeros(n, dtype=np.int64)
+        self.wall_slide = np.zeros(n, dtype=bool)
+        self.dashing = np.zeros(n, dtype=np.int64)
+        self.dash_count = np.zeros(n, dtype=np.int64)
+        self.dash_direction = np.zeros((n, 2), dtype=np.int64)
+        self.dash_direction[:, 0] = 1
+        self.jump_held = np.zeros(n, dtype=bool)
+        self.jump_timer = np.zeros(n, dtype=np.int64)
+        self.max_jump_time = 20
+        self.jump_strength_multiplier = np.ones(n)
+        self.stamina = np.zeros(n)
+        self.wall_jump_count = np.zeros(n, dtype=np.int64)
+        self.max_wall_jumps = 1
+        self.moving_left = np.zeros(n, dtype=bool)
+        self.moving_right = np.zeros(n, dtype=bool)
+        self.is_jumping = np.zeros(n, dtype=bool)
+
+        self.reset()
+
+    def _lookup(self, flag, cx, cy):
+        mask = self.flag_masks[flag]
+        gx = cx - self.tilemap.grid_origin[0]
+        gy = cy - self.tilemap.grid_origin[1]
+        inside = (gx >= 0) & (gx < mask.shape[1]) & (gy >= 0) & (gy < mask.shape[0])
+        return mask[np.where(inside, gy, 0), np.where(inside, gx, 0)] & inside
+
+    def _overlap_check(self, flag):
+        # same as Tilemap.spike_check: any flagged cell overlapping the int rect
+        left = np.trunc(self.pos[:, 0]).astype(np.int64)
+        top = np.trunc(self.pos[:, 1]).astype(np.int64)
+        hit = np.zeros(self.num_envs, dtype=bool)
+        for cx in (left // TILE_SIZE, (left + self.size[0] - 1) // TILE_SIZE):
+            for cy in (top // TILE_SIZE, (top + self.size[1] - 1) // TILE_SIZE):
+                hit |= self._lookup(flag, cx, cy)
+        return hit
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        self.pos[mask] = self.default_pos
+        self.velocity[mask] = 0
+        self.stamina[mask] = 110
+        self.air_time[mask] = 0
+        self.jumps[mask] = 1
+        self.dashing[mask] = 0
+        self.dash_count[mask] = 2
+        self.wall_slide[mask] = False
+        self.moving_left[mask] = False
+        self.moving_right[mask] = False
+        self.is_jumping[mask] = False
+        self.wall_jump_count[mask] = 0
+        return self.get_observation()
+
+    def get_observation(self):
+        return np.stack([self.pos[:, 0], self.pos[:, 1], self.velocity[:, 0], self.velocity[:, 1],
+                         self.dashing, self.dash_count, self.stamina, self.jumps], axis=1)
+
+    def gather(self, indices):
+        # keep only the given players, in that order; repeats clone a player
+        for name in STATE_COLUMNS:
+            setattr(self, name, getattr(self, name)[indices])
+        self.collisions = {side: column[indices] for side, column in self.collisions.items()}
+        self.num_envs = len(indices)
+
+    def advance(self, actions, states):
+        # one frame, no rewards and no resets: players that died keep going
+        self._move(np.asarray(actions), np.asarray(states))
+        self._update()
+        return self._overlap_check(TILE_FLAG_SPIKE), self._overlap_check(TILE_FLAG_FINISH)
+
+    def step(self, actions, states):
+        died, finished = self.advance(actions, states)
+        rewards = np.where(died, REWARD_DEATH, 0.0) + np.where(finished, REWARD_FINISH, 0.0)
+        dones = died | finished
+        if dones.any():
+            self.reset(dones)
+
+        return self.get_observation(), rewards, dones, {'death': died, 'finish': finished}
+
+    def _move(self, actions, states):
+        # Environment.move -> Player.stop_movement / move_left / move_right
+        self.jump_held[:] = False
+        self.jump_timer[:] = 0
+        self.jump_strength_multiplier[:] = 1.0
+
+        action_x = ACTION_X[actions]
+        left = action_x < 0
+        right = action_x > 0
+        self.moving_left[:] = left
+        self.moving_right[:] = right
+        self.flip[left] = True
+        self.flip[right] = False
+
+        self.is_jumping[:] = states == 1
+        jumping = states == 1
+        if jumping.any():
+            self._jump(actions, jumping)
+        dashing = states == 2
+        if dashing.any():
+            self._dash(actions, dashing)
+
+    def _jump(self, actions, mask):
+        wall_jump = mask & self.wall_slide & (self.stamina > 20) & (self.wall_jump_count < self.max_wall_jumps)
+        self.stamina[wall_jump] -= 20
+        self.wall_jump_count[wall_jump] += 1
+
+        wall_left = wall_jump & self.collisions['left']
+        wall_right = wall_jump & ~self.collisions['left'] & self.collisions['right']
+        wall_jumped = wall_left | wall_right
+        self.velocity[wall_left, 0] = PLAYER_WALL_JUMP_HORIZONTAL * 0.8
+        self.velocity[wall_right, 0] = -PLAYER_WALL_JUMP_HORIZONTAL * 0.8
+        self.velocity[wall_jumped, 1] = -PLAYER_WALL_JUMP_VERTICAL
+        self.air_time[wall_jumped] = PLAYER_AIR_TIME_THRESHOLD + 1
+        self.jump_held[wall_jumped] = True
+
+        jump = mask & ~wall_jump & (self.jumps > 0)
+        self.velocity[jump, 1] = -PLAYER_JUMP_POWER
+        action_x = ACTION_X[actions]
+        jump_left = jump & (action_x < 0)
+        jump_right = jump & (action_x > 0)
+        self.velocity[jump_left, 0] = -PLAYER_SPEED * 1.1
+        self.velocity[jump_right, 0] = PLAYER_SPEED * 1.1
+        self.flip[jump_left] = True
+        self.flip[jump_right] = False
+        self.jumps[jump] -= 1
+        self.air_time[jump] = PLAYER_AIR_TIME_THRESHOLD + 1
+        self.jump_held[jump] = True
+
+    def _dash(self, actions, mask):
+        mask = mask & (self.dash_count > 0)
+
+        direction_x = ACTION_X[actions]
+        direction_y = ACTION_Y[actions]
+        no_direction = (direction_x == 0) & (direction_y == 0)
+        direction_x = np.where(no_direction, np.where(self.flip, -1, 1), direction_x)
+
+        self.dash_direction[mask, 0] = direction_x[mask]
+        self.dash_direction[mask, 1] = direction_y[mask]
+
+        dashing = np.where(direction_x < 0, -PLAYER_DASH_DURATION,
+                  np.where(direction_x > 0, PLAYER_DASH_DURATION,
+                  np.where(self.flip, -PLAYER_DASH_DURATION, PLAYER_DASH_DURATION)))
+        self.dashing[mask] = dashing[mask]
+        self.flip[mask & (direction_x < 0)] = True
+        self.flip[mask & (direction_x > 0)] = False
+        self.dash_count[mask] -= 1
+
+    def _update(self):
+        for side in self.collisions.values():
+            side[:] = False
+        vx = self.velocity[:, 0]
+        vy = self.velocity[:, 1]
+
+        movement_x = self.moving_right.astype(np.int64) - self.moving_left.astype(np.int64)
+        control = np.abs(self.dashing) <= PLAYER_DASH_DURATION - 10
+
+        target_speed = movement_x * PLAYER_SPEED
+        accelerate = np.abs(vx) < np.abs(target_speed)
+        accelerated = np.clip(vx + movement_x * 0.8, -PLAYER_SPEED, PLAYER_SPEED)
+        steered = np.where(accelerate, accelerated, target_speed)
+        slowed = np.where(vx > 0, np.maximum(vx - FRICTION * 1.5, 0),
+                 np.where(vx < 0, np.minimum(vx + FRICTION * 1.5, 0), vx))
+        vx[:] = np.where(control, np.where(movement_x != 0, steered, slowed), vx)
+
+        vy[:] = np.minimum(MAX_FALL_SPEED, vy + 0.1)
+
+        frame_movement = self.velocity.copy()
+        self._collide_axis(0, frame_movement[:, 0])
+        self._collide_axis(1, frame_movement[:, 1])
+
+        self.flip[movement_x > 0] = False
+        self.flip[movement_x < 0] = True
+
+        vertical = self.collisions['down'] | self.collisions['up']
+        vy[vertical] = 0
+
+        self.air_time += 1
+
+        down = self.collisions['down']
+        self.air_time[down] = 0
+        self.jumps[down] = 1
+        self.jump_timer[down] = 0
+        self.jump_strength_multiplier[down] = 1.0
+        self.dash_count[down] = 2
+        self.wall_jump_count[down] = 0
+
+        self.stamina[:] = np.where(down, np.minimum(110, self.stamina + 1),
+                          np.where(self.wall_slide, np.maximum(0, self.stamina - 1/6), self.stamina))
+
+        side = self.collisions['right'] | self.collisions['left']
+        self.wall_slide[:] = side & (self.air_time > PLAYER_AIR_TIME_THRESHOLD) & (vy > 0) & (self.stamina > 0)
+        vy[self.wall_slide] = np.minimum(vy[self.wall_slide], PLAYER_WALL_SLIDE_SPEED)
+        self.flip[self.wall_slide & self.collisions['right']] = False
+        self.flip[self.wall_slide & ~self.collisions['right'] & self.collisions['left']] = True
+
+        boost = self.is_jumping & self.jump_held & (self.jump_timer < self.max_jump_time)
+        self.jump_timer[boost] += 1
+        vy[boost] += -0.3 * self.jump_strength_multiplier[boost]
+        self.jump_strength_multiplier[boost] = np.maximum(0.5, 1.0 - (self.jump_timer[boost] / (self.max_jump_time * 2)))
+
+        self._update_dash()
+
+    def _collide_axis(self, axis, movement):
+        # batched Tilemap.sweep: walk the cells entered along the axis, nearest
+        # first, for as many cells as the fastest player crosses this frame
+        size = self.size[axis]
+        cross_size = self.size[1 - axis]
+        start = np.trunc(self.pos[:, axis]).astype(np.int64)
+        end = np.trunc(self.pos[:, axis] + movement).astype(np.int64)
+        other = np.trunc(self.pos[:, 1 - axis]).astype(np.int64)
+
+        forward = movement > 0
+        backward = movement < 0
+        first = np.where(forward, -(-(start + size) // TILE_SIZE), start // TILE_SIZE - 1)
+        last = np.where(forward, (end + size - 1) // TILE_SIZE, end // TILE_SIZE)
+        step = np.where(forward, 1, -1)
+        count = np.where(forward | backward, (last - first) * step + 1, 0)
+        across_first = other // TILE_SIZE
+        across_count = (other + cross_size - 1) // TILE_SIZE - across_first + 1
+
+        hit = np.zeros(self.num_envs, dtype=bool)
+        hit_cell = np.zeros(self.num_envs, dtype=np.int64)
+        for k in range(max(int(count.max()), 0)):
+            cell = first + k * step
+            pending = ~hit & (k < count)
+            solid = np.zeros(self.num_envs, dtype=bool)
+            for j in range(int(across_count.max())):
+                cross = across_first + j
+                cx, cy = (cell, cross) if axis == 0 else (cross, cell)
+                solid |= self._lookup(TILE_FLAG_SOLID, cx, cy) & (j < across_count)
+            stopped = pending & solid
+            hit_cell[stopped] = cell[stopped]
+            hit |= stopped
+
+        positive, negative = ('right', 'left') if axis == 0 else ('down', 'up')
+        self.collisions[positive] |= hit & forward
+        self.collisions[negative] |= hit & backward
+        self.pos[:, axis] = np.where(hit & forward, hit_cell * TILE_SIZE - size,
+                            np.where(hit, (hit_cell + 1) * TILE_SIZE, self.pos[:, axis] + movement))
+
+    def _update_dash(self):
+        self.dashing[:] = np.where(self.dashing > 0, np.maximum(0, self.dashing - 1),
+                          np.where(self.dashing < 0, np.minimum(0, self.dashing + 1), 0))
+
+        active = np.abs(self.dashing) > PLAYER_DASH_DURATION - 10
+        if not active.any():
+            return
+        direction_x = self.dash_direction[:, 0]
+        direction_y = self.dash_direction[:, 1]
+        dash_power = np.where((direction_x != 0) & (direction_y != 0), PLAYER_DASH_SPEED * 1.2 * 0.7071, PLAYER_DASH_SPEED * 1.2)
+        self.velocity[active, 0] = (direction_x * dash_power)[active]
+        self.velocity[active, 1] = (direction_y * dash_power * 0.8)[active]